@@ -21,6 +21,7 @@ class OnnxYolo8Detect:  # Renamed class
         dic_labels: {0: 'person', 1: 'bicycle'}
         """
         self.dic_labels = {0: 'echo'}
+        self._input_buf = None  # 复用的预处理输出缓冲区 (1, 3, H, W) float32
         self.weights = weights
         # Store model_h and model_w for preprocessing.
         # These will be the target dimensions for the letterbox function.
@@ -108,15 +109,17 @@ class OnnxYolo8Detect:  # Renamed class
 
     def _preprocess(self, img):
         """图像预处理（保持宽高比的缩放填充）"""
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        # Use preprocess_target_h and preprocess_target_w for letterboxing
-        img_letterboxed, pad = self.letterbox(img_rgb, (self.preprocess_target_h, self.preprocess_target_w))
+        # 先缩放再转 RGB: 通道交换与缩放可交换，颜色转换只作用在模型输入大小的小图上
+        img, pad = self.letterbox(img, (self.preprocess_target_h, self.preprocess_target_w))
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
-        image_data = np.array(img_letterboxed) / 255.0
-        image_data = np.transpose(image_data, (2, 0, 1))  # Channel first HWC to CHW
-        image_data = np.expand_dims(image_data, axis=0).astype(np.float32)
+        # 归一化并转为 NCHW，写入复用的 float32 输入缓冲区，避免每帧分配 float64 中间数组
+        h, w = img.shape[:2]
+        if self._input_buf is None or self._input_buf.shape[2:] != (h, w):
+            self._input_buf = np.empty((1, 3, h, w), dtype=np.float32)
+        np.divide(img.transpose(2, 0, 1), 255.0, out=self._input_buf[0], casting='same_kind')
 
-        return image_data, pad
+        return self._input_buf, pad
 
     def _postprocess(self, outputs_from_model, padding, orig_shape, confidence_threshold, label):
         """
@@ -126,10 +129,6 @@ class OnnxYolo8Detect:  # Renamed class
         processed_outputs = np.transpose(np.squeeze(outputs_from_model[0]))
         rows = processed_outputs.shape[0]
 
-        boxes = []
-        scores = []
-        class_ids = []
-
         # The 'gain' calculation below replicates the logic from the original OpenVINO-based code.
         # In the original code, self.input_width stored model height, and self.input_height stored model width.
         # The gain was calculated as: min(variable_storing_width / original_image_height, variable_storing_height / original_image_width).
@@ -147,25 +146,21 @@ class OnnxYolo8Detect:  # Renamed class
         processed_outputs[:, 0] -= padding[1]  # Adjust x-coordinates by left padding
         processed_outputs[:, 1] -= padding[0]  # Adjust y-coordinates by top padding
 
-        for i in range(rows):
-            classes_scores = processed_outputs[i][4:]
-            max_score = np.amax(classes_scores)
-            class_id = np.argmax(classes_scores)
-
-            if max_score >= confidence_threshold and (label == -1 or label == class_id):
-                x, y, w, h = processed_outputs[i][0], processed_outputs[i][1], processed_outputs[i][2], \
-                    processed_outputs[i][3]
-
-                left = int((x - w / 2) / gain)
-                top = int((y - h / 2) / gain)
-                width = int(w / gain)
-                height = int(h / gain)
-
-                class_ids.append(class_id)
-                scores.append(max_score)
-                boxes.append([left, top, width, height])
-
-        indices = cv2.dnn.NMSBoxes(boxes, scores, confidence_threshold, self.iou_threshold)
+        # 向量化筛选: 一次算出每行的最大类别分数与类别，只对保留的行换算坐标
+        classes_scores = processed_outputs[:, 4:]
+        class_ids = np.argmax(classes_scores, axis=1)
+        max_scores = classes_scores[np.arange(rows), class_ids]
+        keep = max_scores >= confidence_threshold
+        if label != -1:
+            keep &= class_ids == label
+        xywh = processed_outputs[keep, :4]
+        class_ids = class_ids[keep]
+        scores = max_scores[keep]
+        # (x - w / 2, y - h / 2, w, h) / gain，astype 与 int() 一样向零取整
+        ltwh = np.concatenate((xywh[:, :2] - xywh[:, 2:4] / 2, xywh[:, 2:4]), axis=1) / gain
+        boxes = ltwh.astype(np.int64).tolist()
+
+        indices = cv2.dnn.NMSBoxes(boxes, scores.tolist(), confidence_threshold, self.iou_threshold)
 
         results = []
         # Check if indices is not an empty tuple, which can happen if NMSBoxes returns nothing.
@@ -21,6 +21,7 @@ class OpenVinoYolo8Detect:  # Renamed class
         dic_labels: {0: 'person', 1: 'bicycle'}
         """
         self.dic_labels = {0: 'echo'}
+        self._input_buf = None  # 复用的预处理输出缓冲区 (1, 3, H, W) float32
         self.weights = weights
         self.model_size = (model_w, model_h)
         self.iou_threshold = iou_thres
@@ -79,22 +80,18 @@ class OpenVinoYolo8Detect:  # Renamed class
         return img, (top, left)
 
     def _preprocess(self, img):
-        """图像预处理（保持宽高比的缩放填充） - unchanged"""
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
+        """图像预处理（保持宽高比的缩放填充）"""
+        # 先缩放再转 RGB: 通道交换与缩放可交换，颜色转换只作用在模型输入大小的小图上
         img, pad = self.letterbox(img, (self.input_width, self.input_height))
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
-        # Normalize the image data by dividing it by 255.0
-        image_data = np.array(img) / 255.0
-
-        # Transpose the image to have the channel dimension as the first dimension
-        image_data = np.transpose(image_data, (2, 0, 1))  # Channel first
-
-        # Expand the dimensions of the image data to match the expected input shape
-        image_data = np.expand_dims(image_data, axis=0).astype(np.float32)
+        # 归一化并转为 NCHW，写入复用的 float32 输入缓冲区，避免每帧分配 float64 中间数组
+        h, w = img.shape[:2]
+        if self._input_buf is None or self._input_buf.shape[2:] != (h, w):
+            self._input_buf = np.empty((1, 3, h, w), dtype=np.float32)
+        np.divide(img.transpose(2, 0, 1), 255.0, out=self._input_buf[0], casting='same_kind')
 
-        # Return the preprocessed image data
-        return image_data, pad
+        return self._input_buf, pad
 
     def _postprocess(self, outputs, padding, orig_shape, confidence_threshold, label):
         """
@@ -117,45 +114,28 @@ class OpenVinoYolo8Detect:  # Renamed class
         # Get the number of rows in the outputs array
         rows = outputs.shape[0]
 
-        # Lists to store the bounding boxes, scores, and class IDs of the detections
-        boxes = []
-        scores = []
-        class_ids = []
-
         # Calculate the scaling factors for the bounding box coordinates
         gain = min(self.input_height / orig_shape[0], self.input_width / orig_shape[1])
 
         outputs[:, 0] -= padding[1]
         outputs[:, 1] -= padding[0]
 
-        # Iterate over each row in the outputs array
-        for i in range(rows):
-            # Extract the class scores from the current row
-            classes_scores = outputs[i][4:]
-
-            # Find the maximum score among the class scores
-            max_score = np.amax(classes_scores)
-            class_id = np.argmax(classes_scores)
-            # If the maximum score is above the confidence threshold
-            if max_score >= confidence_threshold and (label == -1 or label == class_id):
-                # Get the class ID with the highest score
-
-                # Extract the bounding box coordinates from the current row
-                x, y, w, h = outputs[i][0], outputs[i][1], outputs[i][2], outputs[i][3]
-
-                # Calculate the scaled coordinates of the bounding box
-                left = int((x - w / 2) / gain)
-                top = int((y - h / 2) / gain)
-                width = int(w / gain)
-                height = int(h / gain)
-
-                # Add the class ID, score, and box coordinates to the respective lists
-                class_ids.append(class_id)
-                scores.append(max_score)
-                boxes.append([left, top, width, height])
+        # 向量化筛选: 一次算出每行的最大类别分数与类别，只对保留的行换算坐标
+        classes_scores = outputs[:, 4:]
+        class_ids = np.argmax(classes_scores, axis=1)
+        max_scores = classes_scores[np.arange(rows), class_ids]
+        keep = max_scores >= confidence_threshold
+        if label != -1:
+            keep &= class_ids == label
+        xywh = outputs[keep, :4]
+        class_ids = class_ids[keep]
+        scores = max_scores[keep]
+        # (x - w / 2, y - h / 2, w, h) / gain，astype 与 int() 一样向零取整
+        ltwh = np.concatenate((xywh[:, :2] - xywh[:, 2:4] / 2, xywh[:, 2:4]), axis=1) / gain
+        boxes = ltwh.astype(np.int64).tolist()
 
         # Apply non-maximum suppression to filter out overlapping bounding boxes
-        indices = cv2.dnn.NMSBoxes(boxes, scores, confidence_threshold, self.iou_threshold)
+        indices = cv2.dnn.NMSBoxes(boxes, scores.tolist(), confidence_threshold, self.iou_threshold)
 
         # Iterate over the selected indices after non-maximum suppression
         results = []
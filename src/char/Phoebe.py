@@ -437,8 +437,9 @@ class Phoebe(BaseChar):
         if self.task.calculate_color_percentage(forte_white_color, box) > 0.08:
             cropped = box.crop_frame(self.task.frame)
             gray = cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY)
-            mean_val = np.mean(gray)
-            contrast_val = np.std(gray)
+            # 单次遍历同时得到均值和标准差
+            mean, std = cv2.meanStdDev(gray)
+            mean_val, contrast_val = mean[0, 0], std[0, 0]
             self.logger.debug(f'is_forte_full mean {mean_val} contrast {contrast_val}')
         return mean_val > 190 and contrast_val > 40
 
@@ -1,53 +1,125 @@
 import math
+from functools import lru_cache
 from typing import Dict, List, Tuple
-from collections import defaultdict
-from itertools import combinations
+from collections import Counter
+from itertools import chain, combinations_with_replacement
+
+import numpy as np
+
+from src.echo.stats import stats_manager, STAT_KEYS, STAT_BITS, MAX_VALUE, AVG_VALUE
+from src.echo.profile import EchoProfile, EntryCoef, ProfileTable
+
+# 得分量化步长，概率计算时把连续得分映射到整数网格上以便用 FFT 卷积
+SCORE_STEP = 0.01
+# 批量卷积时每批处理的组合数，限制频域中间数组的内存占用
+COMBO_BATCH = 16
+# 剩余槽位数不超过该值时直接在取值点上卷积，否则使用 FFT
+DIRECT_MAX_K = 3
+
+
+def _next_fast_len(n: int) -> int:
+    """不小于 n 的最小 5-smooth 数（只含因子 2、3、5），pocketfft 在这类长度上最快"""
+    best = 1 << max(n - 1, 0).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # p35 * 2^m >= n 的最小值
+            quotient = -(-n // p35)
+            candidate = p35 * (1 << max(quotient - 1, 0).bit_length())
+            if candidate < best:
+                best = candidate
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+@lru_cache(maxsize=64)
+def _multiset_combos(group_sizes: Tuple[int, ...], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    从若干组可互换的属性中选取 k 个，枚举所有不同的多重集合。
+    返回 (组合数, k) 的组下标数组，以及每个多重集合对应的原始组合个数。
+    结果只与各组大小和 k 有关，按参数缓存，返回的数组只读。
+    """
+    combos, multiplicity = [], []
+    for combo in combinations_with_replacement(range(len(group_sizes)), k):
+        counts = Counter(combo)
+        if all(taken <= group_sizes[g] for g, taken in counts.items()):
+            combos.append(combo)
+            multiplicity.append(math.prod(math.comb(group_sizes[g], taken) for g, taken in counts.items()))
+    combos = np.fromiter(chain.from_iterable(combos), dtype=np.int8, count=len(combos) * k).reshape(-1, k)
+    multiplicity = np.array(multiplicity, dtype=np.float64)
+    combos.flags.writeable = False
+    multiplicity.flags.writeable = False
+    return combos, multiplicity
+
+
+def _sum_tail_prob(pmf_ffts: np.ndarray, combos: np.ndarray, multiplicity: np.ndarray,
+                   fft_len: int, thr_idx: int) -> float:
+    """对每个属性组合在频域相乘后逆变换，返回所有组合得分 >= thr_idx 的概率按组合个数加权之和"""
+    total = 0.0
+    for start in range(0, len(combos), COMBO_BATCH):
+        # (batch, k, bins) -> (batch, bins)
+        combo_ffts = pmf_ffts[combos[start:start + COMBO_BATCH]].prod(axis=1)
+        combo_dists = np.fft.irfft(combo_ffts, fft_len, axis=-1)
+        total += combo_dists[:, thr_idx:].sum(axis=1) @ multiplicity[start:start + COMBO_BATCH]
+    return total
+
+
+def _sum_tail_prob_direct(pmfs: List[np.ndarray], combos: np.ndarray, multiplicity: np.ndarray,
+                          thr_idx: int) -> float:
+    """
+    直接在各属性的取值点上做卷积，返回所有组合得分 >= thr_idx 的概率按组合个数加权之和。
+    每个属性只有不到 10 个取值，k 较小时 width^k 个取值点远少于 FFT 的网格长度。
+    """
+    # 把各分布的非零取值点补齐到同一宽度，补齐的点概率为 0
+    width = max(np.count_nonzero(pmf) for pmf in pmfs)
+    support_idx = np.zeros((len(pmfs), width), dtype=np.int64)
+    support_prob = np.zeros((len(pmfs), width), dtype=np.float64)
+    for i, pmf in enumerate(pmfs):
+        nonzero = np.flatnonzero(pmf)
+        support_idx[i, :len(nonzero)] = nonzero
+        support_prob[i, :len(nonzero)] = pmf[nonzero]
+
+    n_combos, k = combos.shape
+    # 逐个属性做外和/外积：(组合数, width^j) -> (组合数, width^(j+1))
+    combo_idx = support_idx[combos[:, 0]]
+    combo_prob = support_prob[combos[:, 0]]
+    for j in range(1, k):
+        combo_idx = (combo_idx[:, :, None] + support_idx[combos[:, j]][:, None, :]).reshape(n_combos, -1)
+        combo_prob = (combo_prob[:, :, None] * support_prob[combos[:, j]][:, None, :]).reshape(n_combos, -1)
+    return float(np.where(combo_idx >= thr_idx, combo_prob, 0.0).sum(axis=1) @ multiplicity)
 
-from src.echo.stats import stats_manager
-from src.echo.profile import EchoProfile, EntryCoef
 
 class Calculator:
     def __init__(self):
         self.stats = stats_manager
+        # 扫描大量声骸时已有副词条和阈值高度重复，缓存概率计算结果
+        self._prob_above_cached = lru_cache(maxsize=4096)(self._prob_above)
+        # 每组权重对应的各属性得分分布表，按 STAT_KEYS 顺序；权重相同的 coef 共享同一份
+        self._coef_cache: Dict[Tuple[float, ...], List[np.ndarray]] = {}
 
     def get_score(self, profile: EchoProfile, coef: EntryCoef) -> float:
         """计算当前声骸的评分"""
-        total_score = 0.0
-        # 遍历 coef 中的所有属性权重
-        for key, weight in coef.__dict__.items():
-            if weight > 0 and hasattr(profile, key):
-                value = getattr(profile, key)
-                total_score += value * weight
-        return total_score
+        return profile.get_score(coef)
 
     def get_max_possible_score(self, profile: EchoProfile, coef: EntryCoef) -> float:
         """计算当前状态下理论最大得分"""
         current_score = self.get_score(profile, coef)
         
         # 统计已有的副词条
-        existing_sub_stats = []
-        for key in self.stats.get_all_keys():
-            if getattr(profile, key) > 0:
-                existing_sub_stats.append(key)
-        
-        remaining_slots = 5 - len(existing_sub_stats)
+        existing = profile._vec > 0
+        remaining_slots = 5 - int(existing.sum())
         if remaining_slots <= 0:
             return current_score
 
-        # 找出剩余可用的属性
-        available_stats = []
-        for key in self.stats.get_all_keys():
-            if key not in existing_sub_stats:
-                # 获取该属性的最大可能值
-                dist = self.stats.get_distribution(key)
-                if dist:
-                    max_val = max(d['value'] for d in dist)
-                    weight = getattr(coef, key, 0)
-                    available_stats.append(max_val * weight)
+        # 剩余可用属性的最大可能得分
+        available_stats = (MAX_VALUE * coef._vec)[~existing]
         
         # 贪心选取收益最高的属性
-        available_stats.sort(reverse=True)
-        max_future_score = sum(available_stats[:remaining_slots])
+        if remaining_slots < len(available_stats):
+            available_stats = np.partition(available_stats, -remaining_slots)[-remaining_slots:]
+        max_future_score = float(available_stats.sum())
         
         return current_score + max_future_score
 
@@ -64,105 +136,139 @@ class Calculator:
         """
         # 1. 基础信息
         current_score = self.get_score(profile, coef)
+        # 已有副词条压缩为位掩码（按 STAT_KEYS 的顺序），作为缓存键的一部分
+        existing_mask = int(STAT_BITS[profile._vec > 0].sum())
+        # 按权重的值而不是 coef 对象做键，coef 被修改或回收后也不会命中错误的结果
+        weights = tuple(coef._vec.tolist())
+        return self._prob_above_score(current_score, existing_mask, weights, threshold)
+
+    def get_scores(self, table: ProfileTable, coef: EntryCoef) -> np.ndarray:
+        """批量计算表中所有声骸的评分"""
+        return table.scores(coef)
+
+    def prob_above_scores(self, table: ProfileTable, coef: EntryCoef, threshold: float) -> np.ndarray:
+        """批量计算表中所有声骸强化到满级后评分超过阈值的概率"""
+        weights = tuple(coef._vec.tolist())
+        scores = table.scores(coef)
+        masks = table.existing_mask()
+        # 已满 5 条副词条的声骸不再需要查缓存，直接按当前得分判断
+        probs = (scores >= threshold).astype(np.float64)
+        for i in np.flatnonzero((table.remaining_slots() > 0) & (scores < threshold)):
+            probs[i] = self._prob_above_score(float(scores[i]), int(masks[i]), weights, threshold)
+        return probs
+
+    def _prob_above_score(self, current_score: float, existing_mask: int, weights: Tuple[float, ...],
+                          threshold: float) -> float:
         needed_score = threshold - current_score
         
         if needed_score <= 0:
             return 1.0
 
-        existing_sub_stats = set()
-        for key in self.stats.get_all_keys():
-            if getattr(profile, key) > 0:
-                existing_sub_stats.add(key)
-        
-        k = 5 - len(existing_sub_stats)
+        k = 5 - existing_mask.bit_count()
         if k <= 0:
             return 0.0 if needed_score > 0 else 1.0
 
-        all_keys = set(self.stats.get_all_keys())
-        pool = list(all_keys - existing_sub_stats)
-        
+        # 得分 >= needed_score 对应的网格下标（浮点误差处理）
+        thr_idx = max(0, math.ceil(needed_score / SCORE_STEP - 1e-6))
+
+        return self._prob_above_cached(existing_mask, thr_idx, weights)
+
+    def _prob_above(self, existing_mask: int, thr_idx: int, weights: Tuple[float, ...]) -> float:
+        """prob_above_score 的纯计算部分，只依赖已有副词条、量化后的阈值和权重，结果可缓存"""
+        pool = [i for i in range(len(STAT_KEYS)) if not existing_mask >> i & 1]
+        k = 5 - existing_mask.bit_count()
+
         if len(pool) < k:
             # 理论上不会发生，除非配置文件有问题
             return 0.0
 
+        # 每个属性的得分分布，按 SCORE_STEP 量化到整数网格上的概率数组
+        # 得分分布完全相同的属性（例如所有权重为 0 的属性）互换不影响结果，归为一组
+        coef_pmfs = self._get_coef_pmfs(weights)
+        groups: Dict[bytes, List[int]] = {}
+        for i in pool:
+            groups.setdefault(coef_pmfs[i].tobytes(), []).append(i)
+        pmfs = [coef_pmfs[members[0]] for members in groups.values()]
+        group_sizes = tuple(len(members) for members in groups.values())
+
         # 2. 遍历所有可能的属性组合
         # 假设从属性池中抽取每个属性的概率是均等的（这是目前对游戏机制的通用假设）
-        # 组合数 C(N, k)
-        comb_iter = combinations(pool, k)
-        
-        total_valid_prob = 0.0
+        # 组合数 C(N, k)；按组枚举多重集合，每个多重集合代表 prod(C(组大小, 选取数)) 个组合
+        combos, multiplicity = _multiset_combos(group_sizes, k)
         total_combinations = math.comb(len(pool), k)
-        
-        # 预计算每个属性的得分分布 {score: probability}
-        # 仅计算权重 > 0 的属性，权重为 0 的属性得分恒为 0
-        attr_score_dists = {}
-        for key in pool:
-            weight = getattr(coef, key, 0)
-            dist_list = self.stats.get_distribution(key)
-            # {score: prob}
-            score_dist = defaultdict(float)
-            if weight == 0:
-                score_dist[0.0] = 1.0
-            else:
-                for item in dist_list:
-                    score = item['value'] * weight
-                    prob = item['probability']
-                    score_dist[score] += prob
-            attr_score_dists[key] = score_dist
-
-        # 3. 对每个组合进行计算
-        for attrs_combo in comb_iter:
-            # 初始化总分布：得分 0 的概率为 1
-            current_combo_dist = {0.0: 1.0}
-            
-            # 逐步卷积
-            for attr in attrs_combo:
-                attr_dist = attr_score_dists[attr]
-                new_dist = defaultdict(float)
-                
-                for s1, p1 in current_combo_dist.items():
-                    for s2, p2 in attr_dist.items():
-                        new_dist[s1 + s2] += p1 * p2
-                
-                current_combo_dist = new_dist
-            
-            # 统计当前组合下，得分 >= needed_score 的概率
-            prob_ge = sum(p for s, p in current_combo_dist.items() if s >= needed_score - 1e-9) # 浮点误差处理
-            
-            total_valid_prob += prob_ge
+
+        # 分支限界：每个组合得分的上下界由各属性的最小/最大得分下标相加得到
+        # 上界达不到阈值的组合贡献为 0，下界已超过阈值的组合贡献为其全部概率质量，
+        # 只有剩下的组合才需要做卷积
+        max_idx = np.array([len(pmf) - 1 for pmf in pmfs])
+        min_idx = np.array([int(np.argmax(pmf > 0)) for pmf in pmfs])
+        masses = np.array([pmf.sum() for pmf in pmfs])
+        upper = max_idx[combos].sum(axis=1)
+        lower = min_idx[combos].sum(axis=1)
+
+        certain = lower >= thr_idx
+        uncertain = (upper >= thr_idx) & ~certain
+        total_valid_prob = (masses[combos[certain]].prod(axis=1) * multiplicity[certain]).sum()
+
+        if uncertain.any() and k <= DIRECT_MAX_K:
+            # 3. 剩余槽位少时直接在取值点上卷积
+            total_valid_prob += _sum_tail_prob_direct(pmfs, combos[uncertain], multiplicity[uncertain], thr_idx)
+        elif uncertain.any():
+            # 卷积结果的最大长度由剩余组合中上界最大的决定，统一 FFT 长度后每个属性只需变换一次
+            dist_len = int(upper[uncertain].max()) + 1
+            # 补零到快速长度，补零部分不会产生循环卷积的混叠；
+            # 比 fft_len 更长的分布不会出现在剩余组合中，截断也不影响结果
+            fft_len = _next_fast_len(dist_len)
+            padded = np.zeros((len(pmfs), fft_len))
+            for i, pmf in enumerate(pmfs):
+                padded[i, :len(pmf)] = pmf[:fft_len]
+            pmf_ffts = np.fft.rfft(padded, axis=-1)
+
+            # 3. 否则通过 FFT 批量计算剩余组合超过阈值的概率之和
+            total_valid_prob += _sum_tail_prob(pmf_ffts, combos[uncertain], multiplicity[uncertain],
+                                               fft_len, thr_idx)
 
         # 4. 平均概率
-        return total_valid_prob / total_combinations
+        return float(total_valid_prob / total_combinations)
+
+    def _get_coef_pmfs(self, weights: Tuple[float, ...]) -> List[np.ndarray]:
+        """获取一组权重下所有属性的得分分布，首次使用时构建并缓存"""
+        pmfs = self._coef_cache.get(weights)
+        if pmfs is None:
+            # 权重为 0 的属性得分恒为 0，对应 [1.0]
+            pmfs = [self._build_score_pmf(key, weight) for key, weight in zip(STAT_KEYS, weights)]
+            self._coef_cache[weights] = pmfs
+        return pmfs
+
+    def _build_score_pmf(self, key: str, weight: float) -> np.ndarray:
+        """将属性的数值分布乘以权重后量化为得分概率数组，下标 i 表示得分 i * SCORE_STEP"""
+        if weight == 0:
+            return np.ones(1)
+
+        dist_list = self.stats.get_distribution(key)
+        values = np.array([item['value'] for item in dist_list], dtype=np.float64)
+        probs = np.array([item['probability'] for item in dist_list], dtype=np.float64)
+        score_idx = np.rint(values * weight / SCORE_STEP).astype(np.int64)
+
+        pmf = np.zeros(score_idx.max() + 1)
+        np.add.at(pmf, score_idx, probs)
+        return pmf
 
     def get_expected_score(self, profile: EchoProfile, coef: EntryCoef) -> float:
         """计算期望得分（简化版，仅计算平均期望）"""
         current_score = self.get_score(profile, coef)
         
-        existing_sub_stats = set()
-        for key in self.stats.get_all_keys():
-            if getattr(profile, key) > 0:
-                existing_sub_stats.add(key)
-        
-        k = 5 - len(existing_sub_stats)
+        pool = profile._vec == 0
+        num_pool = int(np.count_nonzero(pool))
+        k = 5 - (len(STAT_KEYS) - num_pool)
         if k <= 0:
             return current_score
             
-        all_keys = set(self.stats.get_all_keys())
-        pool = list(all_keys - existing_sub_stats)
-        
         # 计算池中剩余属性的平均期望得分
         # 期望 = Sum(属性i的平均值 * 权重i) / 属性总数
-        pool_expected_sum = 0.0
-        for key in pool:
-            weight = getattr(coef, key, 0)
-            if weight == 0:
-                continue
-            
-            dist = self.stats.get_distribution(key)
-            avg_val = sum(d['value'] * d['probability'] for d in dist)
-            pool_expected_sum += avg_val * weight
+        pool_expected_sum = float(AVG_VALUE @ np.where(pool, coef._vec, 0.0))
             
-        avg_expected_per_slot = pool_expected_sum / len(pool)
+        avg_expected_per_slot = pool_expected_sum / num_pool
         
         return current_score + avg_expected_per_slot * k
 
@@ -1,30 +1,57 @@
 import re
-import json
-import yaml
-from dataclasses import dataclass, field
-from pathlib import Path
+from functools import lru_cache
+import numpy as np
+from dataclasses import dataclass, field, fields, InitVar
 from PIL import Image
-from copy import deepcopy
-from typing import Union, Optional
+from typing import Union, Optional, List
 
-# 配置文件路径
-config_dir = Path(__file__).parent.parent.parent / "assets" / "config"
-stat_file = config_dir / "entry_stats.yml"
-coef_file = config_dir / "entry_coef.yml"
-echo_file = Path(__file__).parent.parent.parent / "assets" / "echo.json"
+from src.echo.stats import stats_manager, STAT_KEYS, STAT_INDEX, AVG_VALUE, VALID_VALUES, match_stat_keys
 
 # 初始化日志（暂时注释，等待Python版本问题解决）
 # from ok import Logger
 # logger = Logger.get_logger(__name__)
 
-with open(stat_file, "r", encoding="utf-8") as f:
-    stat_data = yaml.safe_load(f)
-
-with open(coef_file, "r", encoding="utf-8") as f:
-    coef_data = yaml.safe_load(f)
+# 配置数据由 stats_manager 统一加载
+stat_data = stats_manager.get_all_stats()
+coef_data = stats_manager.get_coef_data()
+echo_data = stats_manager.get_echo_data()
+
+# create a regex pattern for each echo name to ignore rare characters which OCR often fails on,
+# compiled once and sorted by name length so the longest matching name wins
+_RARE_CHARS = ['魇', '螯', '獠', '鬃', '翎', '鸷', '鹭', '傀', '哨', '蜥', '磐', '铎', '镰', '簇', '湮', '釉', '蛰', '鳄', '飓', '芙']
+_IGNORE_CHARS = ['·']
+_NAME_SUBSTITUTION = str.maketrans({**{c: '.' for c in _RARE_CHARS}, **{c: '.?' for c in _IGNORE_CHARS}})
+_NAME_PATTERNS = sorted(((re.compile(name.translate(_NAME_SUBSTITUTION)), name) for name in echo_data),
+                        key=lambda item: -len(item[1]))
+_NUM_RE = re.compile(r"\d+\.?\d?")
+
+@lru_cache(maxsize=1024)
+def _extract_entry(line: str) -> Optional[str]:
+    # 匹配结果按名称长度降序，取第一个类型（百分比/数值）一致的属性
+    is_percentage = "%" in line
+    for key in match_stat_keys(line):
+        if is_percentage == (stat_data[key]["type"] == "percentage"):
+            return key
+    return None
 
-with open(echo_file, "r", encoding="utf-8") as f:
-    echo_data = json.load(f)
+class _StatVector:
+    """按 STAT_KEYS 顺序把各属性值缓存为 numpy 向量，属性被修改时自动失效"""
+    # 子类都是 slots dataclass，缓存也放在 slot 里；_hash_cache 供 EchoProfile 缓存哈希值
+    __slots__ = ('_vec_cache', '_hash_cache')
+
+    def __setattr__(self, key, value):
+        object.__setattr__(self, key, value)
+        if key in STAT_INDEX:
+            object.__setattr__(self, '_vec_cache', None)
+
+    @property
+    def _vec(self) -> np.ndarray:
+        vec = getattr(self, '_vec_cache', None)
+        if vec is None:
+            vec = np.array([getattr(self, key) for key in STAT_KEYS], dtype=np.float64)
+            vec.flags.writeable = False
+            object.__setattr__(self, '_vec_cache', vec)
+        return vec
 
 @dataclass
 class DiscardScheduler:
@@ -37,8 +64,9 @@ class DiscardScheduler:
     #     thresholds = [self.level_5_9, self.level_10_14, self.level_15_19, self.level_20_24]
     #     return profile_cpp.DiscardScheduler(thresholds)
 
-@dataclass 
-class EntryCoef:
+@dataclass(slots=True)
+class EntryCoef(_StatVector):
+    char_name: InitVar[Optional[str]] = None
     atk_rate: float = field(default=0.0)
     atk_num: int = field(default=0)
     def_rate: float = field(default=0.0)
@@ -53,21 +81,7 @@ class EntryCoef:
     resonance_burst: float = field(default=0.0)
     resonance_eff: float = field(default=0.0)
 
-    def __init__(self, char_name: str = None):
-        self.atk_rate = 0.0
-        self.atk_num = 0
-        self.def_rate = 0.0
-        self.def_num = 0
-        self.hp_rate = 0.0
-        self.hp_num = 0
-        self.cri_rate = 0.0
-        self.cri_dmg = 0.0
-        self.normal_dmg = 0.0
-        self.charged_atk = 0.0
-        self.resonance_skill = 0.0
-        self.resonance_burst = 0.0
-        self.resonance_eff = 0.0
-        
+    def __post_init__(self, char_name: Optional[str]):
         for key, value in coef_data["Default"]["coef"].items():
             setattr(self, key, value)
         
@@ -95,8 +109,13 @@ class EntryCoef:
     # def to_cpp(self):
     #     return profile_cpp.EntryCoef({k: float(v) for k, v in self.__dict__.items()})
 
-@dataclass
-class EchoProfile:
+@lru_cache(maxsize=64)
+def get_entry_coef(char_name: Optional[str]) -> EntryCoef:
+    """按角色缓存的 EntryCoef, 多次运行任务时共享; 返回值不应被修改"""
+    return EntryCoef(char_name)
+
+@dataclass(slots=True)
+class EchoProfile(_StatVector):
     level: int = field(default=0)
     name: str = field(default="")
     atk_rate: float = field(default=0.0)
@@ -124,15 +143,33 @@ class EchoProfile:
     #     data['level'] = cpp_profile.level
     #     return cls().from_dict(data)
 
+    def clone(self) -> "EchoProfile":
+        """浅拷贝；所有字段都是不可变的数值/字符串，缓存的向量只读且修改时会被替换，可以安全共享"""
+        profile = EchoProfile.__new__(EchoProfile)
+        for name in _PROFILE_SLOTS:
+            object.__setattr__(profile, name, getattr(self, name, None))
+        return profile
+
+    def __setattr__(self, key, value):
+        # slots dataclass 会重新创建类，这里不能使用无参数的 super()
+        _StatVector.__setattr__(self, key, value)
+        if key == "level" or key in STAT_INDEX:
+            object.__setattr__(self, "_hash_cache", None)
+
     def __hash__(self):
-        return hash(tuple([(k, v) for k, v in self.__dict__.items() if k not in ["name"]]))
+        # 等级 + 属性向量的字节串，计算一次后缓存，字段被修改时失效（name 不参与哈希）
+        h = getattr(self, "_hash_cache", None)
+        if h is None:
+            h = hash((self.level, self._vec.tobytes()))
+            object.__setattr__(self, "_hash_cache", h)
+        return h
     
     def validate(self) -> bool:
         if not 0 <= self.level <= 25:
             # logger.warning(f"Validation failed due to invalid level: {self.level}")
             return False
 
-        if self.name not in echo_data.keys():
+        if self.name not in echo_data:
             if self.name == "":
                 # logger.warning("Validation failed at name identification")
                 pass
@@ -142,49 +179,32 @@ class EchoProfile:
             return False
 
         # check the number of non-zero entries
-        num_non_zero = sum(1 for key, value in self.__dict__.items() if value != 0 and key not in ["level", "name"])
+        num_non_zero = int(np.count_nonzero(self._vec))
         if num_non_zero != self.level // 5:
             # logger.warning(f"Validation failed due to invalid number of non-zero entries: {num_non_zero} != {self.level // 5}")
             # logger.warning(f"Profile: {self}")
             return False
 
         # ensure all non-zero entries are valid
-        for key, value in self.__dict__.items():
-            if key in ["level", "name"] or value == 0:
+        for key in STAT_KEYS:
+            value = getattr(self, key)
+            if value == 0:
                 continue
 
-            matched = False
-            for entry in stat_data[key]["distribution"]:
-                if entry["value"] == value:
-                    matched = True
-                    break
-
-            if not matched:
+            if round(value, 4) not in VALID_VALUES[key]:
                 # logger.warning(f"Validation failed due to invalid entry {key}: {value}")
                 return False
 
         return True
     
     def _extract_number(self, line: str) -> Optional[float]:
-        numbers = re.findall(r"\d+\.?\d?", line)
+        numbers = _NUM_RE.findall(line)
         if numbers:
             return float(numbers[0])
         return None
     
     def _extract_entry(self, line: str) -> Optional[str]:
-        longest_entry_name, longest_entry_key = "", ""
-        for key, entry in stat_data.items():
-            if entry["name"] in line:
-                if ("%" in line) != (entry["type"] == "percentage"):
-                    continue
-                
-                if len(entry["name"]) > len(longest_entry_name):
-                    longest_entry_name = entry["name"]
-                    longest_entry_key = key
-        
-        if longest_entry_name:
-            return longest_entry_key
-        return None
+        return _extract_entry(line)
     
     def from_image(self, image: Image.Image) -> "EchoProfile":
         # TODO: 使用目标工程的OCR系统
@@ -207,25 +227,11 @@ class EchoProfile:
                 continue
 
             if self.name == "" and self.level == 0:
-                matched_longest_name = ""
-                for name in echo_data.keys():
-                    # create a regex pattern for the name to ignore rare characters 
-                    # and match the line with the pattern
-                    rare_chars = ['魇', '螯', '獠', '鬃', '翎', '鸷', '鹭', '傀', '哨', '蜥', '磐', '铎', '镰', '簇', '湮', '釉', '蛰', '鳄', '飓', '芙']
-                    ignore_chars = ['·']
-
-                    substituted_name = name
-
-                    for rare_char in rare_chars:
-                        substituted_name = substituted_name.replace(rare_char, ".")
-                    for ignore_char in ignore_chars:
-                        substituted_name = substituted_name.replace(ignore_char, ".?")
-                    pattern = re.compile(substituted_name)
-
-                    if re.search(pattern, line):
-                        if len(name) > len(matched_longest_name):
-                            matched_longest_name = name
-                            self.name = name
+                # 模式已按名称长度降序排列，第一个匹配的就是最长的名称
+                for pattern, name in _NAME_PATTERNS:
+                    if pattern.search(line):
+                        self.name = name
+                        break
                 continue
 
             if lines_to_skip > 0:
@@ -249,7 +255,7 @@ class EchoProfile:
             logger.warning(f"Invalid entry: {new_entry}")
             return None
         
-        tmp_profile = deepcopy(self)
+        tmp_profile = self.clone()
         tmp_profile.level = level
         
         if longest_entry_key:
@@ -262,30 +268,19 @@ class EchoProfile:
         return None
     
     def get_score(self, coef: EntryCoef) -> float:
-        total_score = 0
-        for key, value in coef.__dict__.items():
-            total_score += getattr(self, key) * value
-        return total_score
+        return float(np.dot(self._vec, coef._vec))
 
     def get_expected_score(self, coef: EntryCoef) -> float:
-        tmp_profile = deepcopy(self)
         remain_slots = (25 - self.level) // 5
 
-        possible_entries = []
+        # 剩余槽位在所有空属性间平均分配，每个空属性取其数值期望
+        empty = self._vec == 0
+        num_empty = int(empty.sum())
+        if num_empty == 0:
+            return self.get_score(coef)
 
-        for key in coef.__dict__.keys():
-            curr_value = getattr(self, key)
-            if curr_value == 0:
-                expected_value = 0
-                for entry in stat_data[key]["distribution"]:
-                    expected_value += entry["value"] * entry["probability"]
-                possible_entries.append(key)
-                setattr(tmp_profile, key, expected_value)
-        
-        for key in possible_entries:
-            setattr(tmp_profile, key, getattr(tmp_profile, key) * remain_slots / len(possible_entries))
-        
-        return tmp_profile.get_score(coef)
+        pool_expected = float(np.dot(AVG_VALUE * coef._vec, empty))
+        return self.get_score(coef) + pool_expected * remain_slots / num_empty
     
     # def to_cpp(self):
     #     return profile_cpp.EchoProfile(self.level, {k: float(v) for k, v in self.__dict__.items() if k != "level" and k != "name"})
@@ -304,6 +299,79 @@ class EchoProfile:
         # TODO: 实现纯Python版本的统计计算
         return (0.0, 0.0, 0.0)
 
+_PROFILE_SLOTS = tuple(f.name for f in fields(EchoProfile)) + _StatVector.__slots__
+
+class ProfileTable:
+    """
+    按列存储大量声骸：属性值乘以 VALUE_SCALE 后以 int16 保存为 (N, len(STAT_KEYS)) 的数组，
+    等级和名称各占一列。游戏中的副词条数值都只有一位小数且不超过几百，量化不会损失精度；
+    相比逐个保存 EchoProfile 更省内存，批量评分也只需一次矩阵乘法。
+    """
+    VALUE_SCALE = 10
+
+    def __init__(self, capacity: int = 64):
+        self._values_q = np.zeros((capacity, len(STAT_KEYS)), dtype=np.int16)
+        self._levels = np.zeros(capacity, dtype=np.int8)
+        self.names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def values_q(self) -> np.ndarray:
+        return self._values_q[:len(self)]
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.values_q / self.VALUE_SCALE
+
+    @property
+    def levels(self) -> np.ndarray:
+        return self._levels[:len(self)]
+
+    def append(self, profile: EchoProfile):
+        n = len(self)
+        if n == len(self._levels):
+            # 容量不足时翻倍扩容
+            self._values_q = np.concatenate([self._values_q, np.zeros_like(self._values_q)])
+            self._levels = np.concatenate([self._levels, np.zeros_like(self._levels)])
+        self._values_q[n] = np.rint(profile._vec * self.VALUE_SCALE)
+        self._levels[n] = profile.level
+        self.names.append(profile.name)
+
+    def to_profile(self, i: int) -> EchoProfile:
+        profile = EchoProfile(level=int(self._levels[i]), name=self.names[i])
+        for key, value in zip(STAT_KEYS, (self._values_q[i] / self.VALUE_SCALE).tolist()):
+            setattr(profile, key, value)
+        return profile
+
+    def scores(self, coef: EntryCoef) -> np.ndarray:
+        # 权重保持 float64，把缩放并入权重向量，省去反量化整张表
+        return self.values_q @ (coef._vec / self.VALUE_SCALE)
+
+    def existing_mask(self) -> np.ndarray:
+        """每行已有副词条的位掩码（按 STAT_KEYS 的顺序，第 i 位对应 STAT_KEYS[i]）"""
+        # 13 列布尔值按小端打包成两个字节，再按 uint16 读取
+        packed = np.packbits(self.values_q > 0, axis=1, bitorder='little')
+        packed = np.pad(packed, ((0, 0), (0, 2 - packed.shape[1])))
+        return np.ascontiguousarray(packed).view('<u2').ravel()
+
+    def remaining_slots(self) -> np.ndarray:
+        """每行还能强化出的副词条数量"""
+        return 5 - np.bitwise_count(self.existing_mask()).astype(np.int8)
+
+    def valid_mask(self) -> np.ndarray:
+        """与 EchoProfile.validate 相同的校验规则，返回每行是否合法"""
+        values_q, levels = self.values_q, self.levels
+        valid = (levels >= 0) & (levels <= 25)
+        valid &= np.array([name in echo_data for name in self.names], dtype=bool)
+        valid &= np.count_nonzero(values_q, axis=1) == levels // 5
+        for i, key in enumerate(STAT_KEYS):
+            column = values_q[:, i]
+            valid_q = [round(value * self.VALUE_SCALE) for value in VALID_VALUES[key]]
+            valid &= (column == 0) | np.isin(column, valid_q)
+        return valid
+
 def get_example_profile_above_threshold(level: int, prob: float, coef: EntryCoef, score_thres: float, locked_keys: list = None) -> EchoProfile:
     """获取一个达到指定概率和评分阈值的声骸示例"""
     if locked_keys is None:
@@ -1,14 +1,23 @@
+import json
 from pathlib import Path
+import numpy as np
 import yaml
 from typing import Dict, List, Any
 
 # 配置文件路径
 CONFIG_DIR = Path(__file__).parent.parent.parent / "assets" / "config"
 STAT_FILE = CONFIG_DIR / "entry_stats.yml"
+COEF_FILE = CONFIG_DIR / "entry_coef.yml"
+ECHO_FILE = CONFIG_DIR.parent / "echo.json"
+
+# 优先使用 libyaml 的 C 实现解析
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 class StatsManager:
     _instance = None
     _stats_data: Dict[str, Any] = {}
+    _coef_data: Dict[str, Any] = {}
+    _echo_data: Dict[str, Any] = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -17,18 +26,38 @@ class StatsManager:
         return cls._instance
 
     def _load_data(self):
-        """加载 entry_stats.yml 配置文件"""
+        """加载 entry_stats.yml / entry_coef.yml / echo.json 配置文件，整个进程只解析一次"""
         try:
             with open(STAT_FILE, "r", encoding="utf-8") as f:
-                self._stats_data = yaml.safe_load(f)
+                self._stats_data = yaml.load(f, Loader=YamlLoader)
         except Exception as e:
             print(f"Error loading stats file: {e}")
             self._stats_data = {}
+        try:
+            with open(COEF_FILE, "r", encoding="utf-8") as f:
+                self._coef_data = yaml.load(f, Loader=YamlLoader)
+        except Exception as e:
+            print(f"Error loading coef file: {e}")
+            self._coef_data = {}
+        try:
+            with open(ECHO_FILE, "r", encoding="utf-8") as f:
+                self._echo_data = json.load(f)
+        except Exception as e:
+            print(f"Error loading echo file: {e}")
+            self._echo_data = {}
 
     def get_all_stats(self) -> Dict[str, Any]:
         """获取所有属性的统计数据"""
         return self._stats_data
 
+    def get_coef_data(self) -> Dict[str, Any]:
+        """获取所有角色的副词条权重配置"""
+        return self._coef_data
+
+    def get_echo_data(self) -> Dict[str, Any]:
+        """获取所有声骸的名称与套装数据"""
+        return self._echo_data
+
     def get_stat(self, key: str) -> Dict[str, Any]:
         """获取指定属性的统计数据"""
         return self._stats_data.get(key)
@@ -50,7 +79,7 @@ class StatsManager:
         try:
             if self._user_config_file.exists():
                 with open(self._user_config_file, "r", encoding="utf-8") as f:
-                    self._user_config = yaml.safe_load(f) or {}
+                    self._user_config = yaml.load(f, Loader=YamlLoader) or {}
         except Exception as e:
             print(f"Error loading user config: {e}")
             self._user_config = {}
@@ -71,5 +100,58 @@ class StatsManager:
         self._user_config[key] = value
         self.save_user_config()
 
+    def update_user_conf(self, values: Dict[str, Any]):
+        """批量更新配置, 只写一次文件"""
+        self._user_config.update(values)
+        self.save_user_config()
+
 # 全局单例
 stats_manager = StatsManager()
+
+# 固定顺序的属性键，EchoProfile / EntryCoef 的向量形式按此顺序排列
+STAT_KEYS: tuple = tuple(stats_manager.get_all_keys())
+STAT_INDEX: Dict[str, int] = {key: i for i, key in enumerate(STAT_KEYS)}
+# 每个属性在已有副词条位掩码中对应的位
+STAT_BITS = 1 << np.arange(len(STAT_KEYS), dtype=np.int64)
+# 每个属性可能出现的最大数值
+MAX_VALUE = np.array([max((d['value'] for d in stats_manager.get_distribution(key)), default=0.0)
+                      for key in STAT_KEYS], dtype=np.float64)
+# 每个属性数值的期望 Σ value * probability
+AVG_VALUE = np.array([sum(d['value'] * d['probability'] for d in stats_manager.get_distribution(key))
+                      for key in STAT_KEYS], dtype=np.float64)
+# 每个属性所有合法的数值（取 4 位小数避免浮点误差），用于校验识别结果
+VALID_VALUES: Dict[str, frozenset] = {key: frozenset(round(d['value'], 4) for d in stats_manager.get_distribution(key))
+                                      for key in STAT_KEYS}
+
+
+def _build_name_trie(stats_data: Dict[str, Any]) -> Dict:
+    """把所有属性名构建为字典树，节点的 None 键存放以该节点结尾的属性键"""
+    root = {}
+    for key, stat in stats_data.items():
+        node = root
+        for ch in stat['name']:
+            node = node.setdefault(ch, {})
+        node.setdefault(None, []).append(key)
+    return root
+
+
+_NAME_TRIE = _build_name_trie(stats_manager.get_all_stats())
+
+
+def match_stat_keys(text: str) -> List[str]:
+    """
+    沿字典树扫描一遍文本，找出其中出现的所有属性名。
+    返回对应的属性键，按属性名长度降序排列，同长度时按 STAT_KEYS 顺序，
+    这样 "攻击加成" 之类的长名字会排在 "攻击" 之前。
+    """
+    matched = set()
+    for start in range(len(text)):
+        node = _NAME_TRIE
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if None in node:
+                matched.update(node[None])
+    stats = stats_manager.get_all_stats()
+    return sorted(matched, key=lambda k: (-len(stats[k]['name']), STAT_INDEX[k]))
@@ -1,11 +1,66 @@
 import re
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
+
+import cv2
+import numpy as np
+
 from src.echo.profile import EchoProfile
-from src.echo.stats import stats_manager
+from src.echo.stats import stats_manager, match_stat_keys, STAT_INDEX
 from ok import Logger
 
 logger = Logger.get_logger(__name__)
 
+_STAT_NUM_RE = re.compile(r'(\d+\.?\d*)')
+
+# 声骸详情面板 (等级、名称、副词条) 的屏幕区域, 坐标需要调试确认;
+# 区域没覆盖到面板时一直检测不到变化, 见 panel_seen_change
+_PANEL_BOX = (0.62, 0.1, 0.95, 0.85)
+# 面板缩略图尺寸与判定为 "有变化" 的平均灰度差
+_PANEL_THUMB_SIZE = (64, 64)
+_PANEL_CHANGE_DIFF = 2.0
+
+
+@lru_cache(maxsize=1024)
+def parse_stat_text(text: str) -> Tuple[Optional[str], float]:
+    """
+    解析单行属性文本，例如 "暴击 6.3%" -> ('cri_rate', 6.3)
+    只依赖输入文本，OCR 反复扫描同一面板时直接命中缓存。
+    """
+    # 1. 清洗文本
+    text = text.replace(" ", "").replace(":", "").replace("：", "")
+    
+    # 2. 匹配数值
+    # 匹配小数或整数
+    num_match = _STAT_NUM_RE.search(text)
+    if not num_match:
+        return None, 0.0
+    
+    value_str = num_match.group(1)
+    value = float(value_str)
+    
+    # 3. 匹配属性名
+    # 字典树一次扫描找出所有出现的属性名，结果已按名字长度降序，
+    # 优先匹配长名字，防止 "攻击" 匹配到 "攻击加成"
+    matched_keys = match_stat_keys(text)
+    matched_key = matched_keys[0] if matched_keys else None
+    
+    # 处理特殊情况或别名 (OCR 常见错误)
+    if not matched_key:
+        if "攻" in text and "%" in text: matched_key = "atk_rate"
+        elif "攻" in text: matched_key = "atk_num"
+        elif "防" in text and "%" in text: matched_key = "def_rate"
+        elif "防" in text: matched_key = "def_num"
+        elif "生" in text and "%" in text: matched_key = "hp_rate"
+        elif "生" in text: matched_key = "hp_num"
+        elif "爆" in text or "暴" in text:
+            if "伤" in text: matched_key = "cri_dmg"
+            else: matched_key = "cri_rate"
+        elif "充" in text or "效" in text: matched_key = "resonance_eff"
+    
+    return matched_key, value
+
+
 class EchoVision:
     def __init__(self, task_executor):
         """
@@ -13,6 +68,8 @@ class EchoVision:
         """
         self.task = task_executor
         self.stats_manager = stats_manager
+        # panel_ready 是否检测到过面板变化; 从未检测到时 _PANEL_BOX 可能没覆盖到面板, 结果不可信
+        self.panel_seen_change = False
 
     def scan_echo_panel(self) -> Optional[EchoProfile]:
         """
@@ -34,16 +91,15 @@ class EchoVision:
             logger.warning("Detected level > 0 but no sub stats found, might be OCR error.")
         
         # 4. 构建 EchoProfile
-        profile = EchoProfile(level=level, name=name)
-        
-        # 填充属性
+        # 属性一次性通过构造函数填充，评分用的向量只构建一次
+        known_stats = {}
         for key, value in sub_stats.items():
-            if hasattr(profile, key):
-                setattr(profile, key, value)
+            if key in STAT_INDEX:
+                known_stats[key] = value
             else:
                 logger.warning(f"Unknown stat key: {key} with value {value}")
-                
-        return profile
+
+        return EchoProfile(level=level, name=name, **known_stats)
 
     def _scan_level(self) -> int:
         """
@@ -93,47 +149,33 @@ class EchoVision:
         """
         解析单行属性文本，例如 "暴击 6.3%" -> ('cri_rate', 6.3)
         """
-        # 1. 清洗文本
-        text = text.replace(" ", "").replace(":", "").replace("：", "")
-        
-        # 2. 匹配数值
-        # 匹配小数或整数
-        num_match = re.search(r'(\d+\.?\d*)', text)
-        if not num_match:
-            return None, 0.0
-        
-        value_str = num_match.group(1)
-        value = float(value_str)
-        
-        # 3. 匹配属性名
-        # 遍历 stats_manager 中的所有属性名进行模糊匹配
-        matched_key = None
-        stats = self.stats_manager.get_all_stats()
-        
-        # 优先匹配长名字，防止 "攻击" 匹配到 "攻击加成"
-        sorted_keys = sorted(stats.keys(), key=lambda k: len(stats[k]['name']), reverse=True)
-        
-        for key in sorted_keys:
-            stat_name = stats[key]['name']
-            # 简单的包含匹配
-            if stat_name in text:
-                matched_key = key
-                break
-        
-        # 处理特殊情况或别名 (OCR 常见错误)
-        if not matched_key:
-            if "攻" in text and "%" in text: matched_key = "atk_rate"
-            elif "攻" in text: matched_key = "atk_num"
-            elif "防" in text and "%" in text: matched_key = "def_rate"
-            elif "防" in text: matched_key = "def_num"
-            elif "生" in text and "%" in text: matched_key = "hp_rate"
-            elif "生" in text: matched_key = "hp_num"
-            elif "爆" in text or "暴" in text:
-                if "伤" in text: matched_key = "cri_dmg"
-                else: matched_key = "cri_rate"
-            elif "充" in text or "效" in text: matched_key = "resonance_eff"
-        
-        return matched_key, value
+        return parse_stat_text(text)
+
+    def panel_snapshot(self) -> np.ndarray:
+        """
+        当前帧声骸详情面板区域的灰度缩略图，用于判断面板内容是否变化。
+        """
+        box = self.task.box_of_screen(*_PANEL_BOX)
+        roi = self.task.frame[box.y:box.y + box.height, box.x:box.x + box.width, :3]
+        return cv2.resize(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), _PANEL_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def panel_differs(a: np.ndarray, b: np.ndarray) -> bool:
+        return cv2.norm(a, b, cv2.NORM_L1) > _PANEL_CHANGE_DIFF * a.size
+
+    def panel_ready(self, before: np.ndarray, last: Optional[np.ndarray]) -> Tuple[bool, np.ndarray]:
+        """
+        操作 (翻页 / 强化) 后面板是否已经切换完成：
+        强化按钮可见、面板内容与操作前 before 不同，且与上一次轮询的 last 相同 (动画已结束)。
+        Returns: (是否就绪, 本次的缩略图，作为下一次轮询的 last)
+        """
+        snapshot = self.panel_snapshot()
+        changed = self.panel_differs(snapshot, before)
+        if changed:
+            self.panel_seen_change = True
+        ready = (changed and last is not None and not self.panel_differs(snapshot, last)
+                 and self.task.find_one('echo_enhance_btn') is not None)
+        return ready, snapshot
 
     def check_state(self) -> str:
         """
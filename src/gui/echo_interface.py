@@ -1,5 +1,6 @@
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFrame
+from PySide6.QtCore import Qt, Signal, Slot, QTimer
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QTextEdit
 from qfluentwidgets import (
     ComboBox, PrimaryPushButton, StrongBodyLabel,
     BodyLabel, DoubleSpinBox, CardWidget,
@@ -9,19 +10,68 @@ from qfluentwidgets import (
 from src.echo.stats import stats_manager
 from src.echo.profile import coef_data
 
+# 角色列表 (从 coef_data), 只排序一次
+_SORTED_ROLES = tuple(sorted(coef_data.keys()))
+
+# 角色 -> 权重说明文本, 数据固定, 首次使用时生成
+_role_desc_cache: dict[str, str] = {}
+
+
+def _build_role_desc(role_name: str) -> str:
+    """生成角色推荐属性权重的说明文本"""
+    data = coef_data[role_name]
+    dmg_source = data.get('dmg_source', 'Unknown')
+    coefs = data.get('coef', {})
+
+    # 格式化显示文本
+    desc = f"伤害来源: {dmg_source}\n\n重要副词条权重:\n"
+    sorted_coefs = sorted(coefs.items(), key=lambda x: x[1], reverse=True)
+    for k, v in sorted_coefs:
+        if v > 0:
+            # 获取中文名
+            stat_info = stats_manager.get_stat(k)
+            name = stat_info['name'] if stat_info else k
+            desc += f"- {name}: {v}\n"
+    return desc
+
+
+def _get_role_desc(role_name: str) -> str:
+    desc = _role_desc_cache.get(role_name)
+    if desc is None:
+        desc = _role_desc_cache[role_name] = _build_role_desc(role_name)
+    return desc
+
+
 class EchoInterface(QWidget):
     """声骸强化工具的配置与交互界面"""
     
-    config_changed = Signal(dict) # 配置变更信号
+    # 配置变更信号 (key, value), 每个变更项发送一次; 同线程的接收方连接时应指定 Qt.DirectConnection
+    config_changed = Signal(str, object)
+    log_received = Signal(str) # 跨线程日志投递
 
     def __init__(self, parent=None):
         super().__init__(parent=parent)
         self.stats = stats_manager
+        # 配置写入合并: 短时间内的多次修改只落盘一次
+        self._pending: dict = {}
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(200)
+        self._save_timer.timeout.connect(self._flush_pending)
+        # 日志合并: 每 100ms 最多刷新一次文本框
+        self._log_buf: list[str] = []
+        self._log_timer = QTimer(self)
+        self._log_timer.setSingleShot(True)
+        self._log_timer.setInterval(100)
+        self._log_timer.timeout.connect(self._flush_log)
+        # 任务线程调用 log() 时经事件队列回到界面线程处理, 不阻塞扫描与评分
+        self.log_received.connect(self._buffer_log, Qt.QueuedConnection)
         self.init_ui()
         self.load_config()
         
     def init_ui(self):
-        self.main_layout = QHBoxLayout(self)
+        # 单层网格布局: 左列配置区跨两行, 右列上为权重说明、下为日志
+        self.main_layout = QGridLayout(self)
         
         # --- 左侧：配置区 ---
         self.settings_panel = CardWidget(self)
@@ -30,9 +80,9 @@ class EchoInterface(QWidget):
         # 1. 角色选择
         self.role_label = StrongBodyLabel("目标角色", self)
         self.role_combo = ComboBox(self)
-        # 加载角色列表 (从 coef_data)
-        self.roles = sorted(list(coef_data.keys()))
-        self.role_combo.addItems(self.roles)
+        # 加载角色列表
+        self.roles = _SORTED_ROLES
+        self.role_combo.addItems(list(_SORTED_ROLES))
         self.role_combo.currentTextChanged.connect(self._on_role_changed)
         
         # 2. 阈值设置
@@ -40,14 +90,14 @@ class EchoInterface(QWidget):
         self.threshold_spin = DoubleSpinBox(self)
         self.threshold_spin.setRange(0.0, 1.0)
         self.threshold_spin.setSingleStep(0.05)
-        self.threshold_spin.valueChanged.connect(lambda v: self._save_conf('threshold', v))
+        self.threshold_spin.valueChanged.connect(self._on_threshold_changed)
 
         # 3. 功能开关
         self.auto_tune_switch = SwitchButton("自动调谐", self, indicatorPos=Qt.RightToLeft)
-        self.auto_tune_switch.checkedChanged.connect(lambda v: self._save_conf('auto_tune', v))
+        self.auto_tune_switch.checkedChanged.connect(self._on_auto_tune_changed)
         
         self.auto_next_switch = SwitchButton("自动翻页 (Next)", self, indicatorPos=Qt.RightToLeft)
-        self.auto_next_switch.checkedChanged.connect(lambda v: self._save_conf('auto_next', v))
+        self.auto_next_switch.checkedChanged.connect(self._on_auto_next_changed)
 
         # 4. 布局添加
         self.settings_layout.addWidget(self.role_label)
@@ -61,9 +111,6 @@ class EchoInterface(QWidget):
         self.settings_layout.addStretch(1)
         
         # --- 右侧：信息与日志 ---
-        self.info_panel = QFrame(self)
-        self.info_layout = QVBoxLayout(self.info_panel)
-        
         # 推荐属性展示
         self.attr_card = CardWidget(self)
         self.attr_layout = QVBoxLayout(self.attr_card)
@@ -77,52 +124,100 @@ class EchoInterface(QWidget):
         self.log_text = TextEdit(self)
         self.log_text.setReadOnly(True)
         self.log_text.setPlaceholderText("等待任务启动...")
-        
-        self.info_layout.addWidget(self.attr_card)
-        self.info_layout.addWidget(self.log_text)
+        # 纯文本日志: 关闭富文本识别与撤销栈, 限制行数与边距
+        self.log_text.setAcceptRichText(False)
+        self.log_text.setUndoRedoEnabled(False)
+        self.log_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.log_text.document().setMaximumBlockCount(500)
+        self.log_text.document().setDocumentMargin(2)
         
         # --- 组装 ---
-        self.main_layout.addWidget(self.settings_panel, 1)
-        self.main_layout.addWidget(self.info_panel, 2)
+        self.main_layout.addWidget(self.settings_panel, 0, 0, 2, 1)
+        self.main_layout.addWidget(self.attr_card, 0, 1)
+        self.main_layout.addWidget(self.log_text, 1, 1)
+        self.main_layout.setColumnStretch(0, 1)
+        self.main_layout.setColumnStretch(1, 2)
+        self.main_layout.setRowStretch(1, 1)
 
     def load_config(self):
         """加载上次保存的配置"""
-        last_role = self.stats.get_user_conf('target_role', 'Default')
-        if last_role in self.roles:
-            self.role_combo.setCurrentText(last_role)
-            
-        self.threshold_spin.setValue(self.stats.get_user_conf('threshold', 0.8))
-        self.auto_tune_switch.setChecked(self.stats.get_user_conf('auto_tune', True))
-        self.auto_next_switch.setChecked(self.stats.get_user_conf('auto_next', False))
-        
+        # 批量设置控件时屏蔽信号, 避免每个控件都触发一次保存与 config_changed
+        widgets = (self.role_combo, self.threshold_spin, self.auto_tune_switch, self.auto_next_switch)
+        self.setUpdatesEnabled(False)
+        try:
+            for w in widgets:
+                w.blockSignals(True)
+            last_role = self.stats.get_user_conf('target_role', 'Default')
+            if last_role in self.roles:
+                self.role_combo.setCurrentText(last_role)
+
+            self.threshold_spin.setValue(self.stats.get_user_conf('threshold', 0.8))
+            self.auto_tune_switch.setChecked(self.stats.get_user_conf('auto_tune', True))
+            self.auto_next_switch.setChecked(self.stats.get_user_conf('auto_next', False))
+        finally:
+            for w in widgets:
+                w.blockSignals(False)
+            self.setUpdatesEnabled(True)
+
         # 触发一次刷新
         self._on_role_changed(self.role_combo.currentText())
 
     def _save_conf(self, key, value):
-        self.stats.set_user_conf(key, value)
-        self.config_changed.emit(self.stats._user_config)
+        self._pending[key] = value
+        self._save_timer.start()
+
+    @Slot()
+    def _flush_pending(self):
+        """将待写入的配置一次性保存并通知"""
+        self._save_timer.stop()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self.stats.update_user_conf(pending)
+        for key, value in pending.items():
+            self.config_changed.emit(key, value)
+
+    def hideEvent(self, event):
+        # 界面切走时立即保存, 保证任务读取到最新配置
+        self._flush_pending()
+        super().hideEvent(event)
 
+    @Slot(float)
+    def _on_threshold_changed(self, value):
+        self._save_conf('threshold', value)
+
+    @Slot(bool)
+    def _on_auto_tune_changed(self, checked):
+        self._save_conf('auto_tune', checked)
+
+    @Slot(bool)
+    def _on_auto_next_changed(self, checked):
+        self._save_conf('auto_next', checked)
+
+    @Slot(str)
     def _on_role_changed(self, role_name):
         self._save_conf('target_role', role_name)
         
         # 更新右侧权重显示
         if role_name in coef_data:
-            data = coef_data[role_name]
-            dmg_source = data.get('dmg_source', 'Unknown')
-            coefs = data.get('coef', {})
-            
-            # 格式化显示文本
-            desc = f"伤害来源: {dmg_source}\n\n重要副词条权重:\n"
-            sorted_coefs = sorted(coefs.items(), key=lambda x: x[1], reverse=True)
-            for k, v in sorted_coefs:
-                if v > 0:
-                    # 获取中文名
-                    stat_info = self.stats.get_stat(k)
-                    name = stat_info['name'] if stat_info else k
-                    desc += f"- {name}: {v}\n"
-            
-            self.attr_desc.setText(desc)
+            self.attr_desc.setText(_get_role_desc(role_name))
 
     def log(self, message: str):
-        """追加日志到界面"""
-        self.log_text.append(message)
+        """追加日志到界面, 可在任意线程调用"""
+        self.log_received.emit(message)
+
+    @Slot(str)
+    def _buffer_log(self, message: str):
+        self._log_buf.append(message)
+        if not self._log_timer.isActive():
+            self._log_timer.start()
+
+    @Slot()
+    def _flush_log(self):
+        if not self._log_buf:
+            return
+        text = '\n'.join(self._log_buf) + '\n'
+        self._log_buf.clear()
+        self.log_text.moveCursor(QTextCursor.End)
+        self.log_text.insertPlainText(text)
+        self.log_text.ensureCursorVisible()
@@ -1,10 +1,12 @@
+import time
+
 from qfluentwidgets import FluentIcon
 
 from ok import FindFeature, Logger
 from ok import TriggerTask
 from src.scene.WWScene import WWScene
 from src.task.BaseWWTask import BaseWWTask
-from src.echo.profile import EchoProfile, EntryCoef
+from src.echo.profile import EchoProfile, get_entry_coef
 from src.echo.calculate import calculator
 from src.echo.stats import stats_manager
 from src.echo.vision import EchoVision
@@ -12,6 +14,9 @@ from src.echo.actions import EchoAction
 
 logger = Logger.get_logger(__name__)
 
+# legacy 模式轮询用到的特征名, 列表只构造一次
+_POP_UP_DONE_FEATURES = ['echo_enhance_btn', 'red_dot']
+
 
 class AutoEnhanceEchoTask(TriggerTask, BaseWWTask, FindFeature):
 
@@ -51,12 +56,23 @@ class AutoEnhanceEchoTask(TriggerTask, BaseWWTask, FindFeature):
         auto_tune = stats_manager.get_user_conf('auto_tune', True)
         auto_next = stats_manager.get_user_conf('auto_next', False)
         
-        coef = EntryCoef(target_role)
-        self.log_info(f"Start Smart Enhance. Role: {target_role}, Threshold: {threshold:.2f}")
+        coef = get_entry_coef(target_role)
+        threshold_str = f"{threshold:.2f}"
+        self.log_info(f"Start Smart Enhance. Role: {target_role}, Threshold: {threshold_str}")
+
+        # Estimate max potential score for a fresh echo (level 0)
+        # This serves as the denominator for normalization and only depends on coef
+        max_potential = calculator.get_max_possible_score(EchoProfile(level=0), coef)
+        if max_potential <= 0: max_potential = 1.0 # Avoid division by zero
+        inv_max_potential = 1.0 / max_potential
 
         # Safety loop limit to prevent infinite loops during testing
         loop_count = 0
         max_loops = 100 
+        # Fingerprint of the scan taken before the last action. The same echo again while the
+        # panel did not change means next_echo / enhance was not registered, so stop instead of rescanning it
+        last_fp = None
+        panel_changed = True
 
         while loop_count < max_loops:
             loop_count += 1
@@ -69,33 +85,36 @@ class AutoEnhanceEchoTask(TriggerTask, BaseWWTask, FindFeature):
                 # Let's try to next if enabled, assuming it might be a loading glitch or empty slot
                 if auto_next:
                     self.log_info("Attempting to switch to next echo...")
+                    before = vision.panel_snapshot()
                     action.next_echo()
-                    self.sleep(1.5)
+                    panel_changed = self._wait_panel(vision, before, 1.5)
                     continue
                 else:
                     break
+
+            # EchoProfile's hash covers level and sub stats only, add the name so fresh echoes differ
+            fp = (profile.name, hash(profile))
+            if fp == last_fp and not panel_changed:
+                self.log_warning("Duplicate echo detected, panel not advancing. Stopping.")
+                break
+            last_fp = fp
             
             # 2. Evaluate
             current_score = calculator.get_score(profile, coef)
             expected_score = calculator.get_expected_score(profile, coef)
+            score_ratio = expected_score * inv_max_potential
             
-            # Estimate max potential score for a fresh echo (level 0)
-            # This serves as the denominator for normalization
-            max_potential = calculator.get_max_possible_score(EchoProfile(level=0), coef)
-            if max_potential <= 0: max_potential = 1.0 # Avoid division by zero
-            
-            score_ratio = expected_score / max_potential
-            
-            self.log_info(f"Echo Lv.{profile.level} | Score: {current_score:.1f} | "
-                          f"Exp. Score: {expected_score:.1f} ({score_ratio:.1%})")
+            self.log_info("Echo Lv.%d | Score: %.1f | Exp. Score: %.1f (%.1f%%)"
+                          % (profile.level, current_score, expected_score, score_ratio * 100))
             
             # 3. Decision
             if score_ratio < threshold:
-                self.log_info(f"Decision: TRASH (Ratio {score_ratio:.2f} < {threshold})")
+                self.log_info("Decision: TRASH (Ratio %.2f < %s)" % (score_ratio, threshold_str))
                 if auto_next:
                     # TODO: Implement mark_as_trash if possible
+                    before = vision.panel_snapshot()
                     action.next_echo()
-                    self.sleep(1.5)
+                    panel_changed = self._wait_panel(vision, before, 1.5)
                     continue
                 else:
                     self.log_info("Auto Next is disabled. Stopping.")
@@ -107,35 +126,55 @@ class AutoEnhanceEchoTask(TriggerTask, BaseWWTask, FindFeature):
                 if profile.level < 25:
                     # Enhance step by step (e.g., +5 levels)
                     # For now, we assume one enhance action adds 5 levels or uses available mats
+                    before = vision.panel_snapshot()
                     action.enhance(target_level_step=5)
                     
                     if auto_tune:
                         action.tune()
                     
                     # After enhancement, wait for animation and re-scan
-                    self.sleep(2.0) 
+                    panel_changed = self._wait_panel(vision, before, 2.0)
                     continue
                 else:
                     self.log_info("Echo is max level and meets the threshold.")
                     if auto_next:
+                        before = vision.panel_snapshot()
                         action.next_echo()
-                        self.sleep(1.5)
+                        panel_changed = self._wait_panel(vision, before, 1.5)
                         continue
                     else:
                         break
         
         self.log_info("Task finished.")
 
+    def _wait_panel(self, vision, before, time_out):
+        """
+        Wait until the echo panel has changed from the snapshot `before` taken ahead of the action
+        and has stopped animating, instead of sleeping the full time_out.
+        Returns whether the panel changed within time_out. Until a change has been seen at all the
+        panel region may be missing the panel, so a timeout then only acts as the old fixed sleep
+        and is reported as changed, keeping the duplicate check from stopping the run.
+        """
+        last = None
+
+        def ready():
+            nonlocal last
+            done, last = vision.panel_ready(before, last)
+            return done
+
+        changed = bool(self.wait_until(ready, time_out=time_out, raise_if_not_found=False))
+        if not changed and not vision.panel_seen_change:
+            self.log_debug('echo panel region never changed, falling back to a fixed wait')
+            return True
+        return changed
+
     # --- Legacy Functions for compatibility ---
     def find_echo_enhance(self):
         return self.find_one('echo_enhance_btn')
 
     def legacy_run(self):
         if enhance_button := self.scene.echo_enhance_btn(self.find_echo_enhance):
-            wait = False
-            while self.find_one('echo_enhance_to', horizontal_variance=0.01):
-                self.click(enhance_button, after_sleep=0.5)
-                wait = True
+            wait = self._click_until_gone('echo_enhance_to', enhance_button, horizontal_variance=0.01)
             if wait:
                 handled = self.wait_until(lambda: self.do_handle_pop_up(1), time_out=6)
                 if handled == 'exit':
@@ -149,10 +188,24 @@ class AutoEnhanceEchoTask(TriggerTask, BaseWWTask, FindFeature):
                     self.wait_until(lambda: self.do_handle_pop_up(2), time_out=6)
             return True
 
+    def _click_until_gone(self, feature, btn, max_wait=6.0, **kwargs):
+        """反复点击 btn 直到 feature 消失, 点击间隔与原先一样从 0.5s 起, 仍未消失则退避到 1s; 返回是否点击过"""
+        clicked = False
+        start = time.monotonic()
+        i = 0
+        while self.find_one(feature, **kwargs):
+            if time.monotonic() - start > max_wait:
+                self.log_warning(f'{feature} still visible after {max_wait}s')
+                break
+            self.click(btn, after_sleep=0.5 * 2 ** min(i, 1))
+            clicked = True
+            i += 1
+        return clicked
+
     def do_handle_pop_up(self, step):
         if btn := self.find_one('echo_enhance_confirm'):
             self.click(btn, after_sleep=1)
-        elif feature := self.find_one(['echo_enhance_btn', 'red_dot']):
+        elif feature := self.find_one(_POP_UP_DONE_FEATURES):
             self.log_info(f'found do_handle_pop_up: {feature}')
             return 'ok'
         elif self.find_one('echo_merge'):
@@ -5,7 +5,7 @@ from qfluentwidgets import FluentIcon
 from ok import FindFeature, Logger
 from ok import TriggerTask
 from src.scene.WWScene import WWScene
-from src.task.BaseWWTask import BaseWWTask, f_white_color
+from src.task.BaseWWTask import BaseWWTask
 
 logger = Logger.get_logger(__name__)
 
@@ -39,11 +39,10 @@ class AutoPickTask(TriggerTask, BaseWWTask, FindFeature):
             return
         start = time.time()
         while time.time() - start < 1:
-            f = self.find_one('pick_up_f_hcenter_vcenter', box=self.f_search_box,
-                              threshold=0.8)
+            f = self.find_f()
             if not f:
                 return
-            percent = self.calculate_color_percentage(f_white_color, f)
+            percent = self.f_white_percent(f)
             if percent < 0.5:
                 self.log_debug(f'f white color percent: {percent} wait')
                 self.next_frame()
@@ -399,17 +399,18 @@ class AutoRogueTask(WWOneTimeTask, BaseCombatTask):
         masked_image = cv2.bitwise_and(cropped, cropped, mask=ring_mask)
 
         if masked_image.ndim == 3:
-            non_black_mask = np.all(masked_image != 0, axis=2)
+            # 三个通道都非 0 的像素，等价于 np.all(masked_image != 0, axis=2)
+            non_black_mask = cv2.inRange(masked_image, (1, 1, 1), (255, 255, 255))
         else:
             return 0.0
 
-        free_space = np.count_nonzero(non_black_mask)
+        free_space = cv2.countNonZero(non_black_mask)
         if free_space == 0:
             return 0.0
 
         lower_bound, upper_bound = color_range_to_bound(target_color)
         gray = cv2.inRange(masked_image, lower_bound, upper_bound)
-        colored_pixels = np.count_nonzero(gray == 255)
+        colored_pixels = cv2.countNonZero(gray)
 
         color_percent = colored_pixels / free_space
         return color_percent
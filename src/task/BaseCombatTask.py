@@ -1,6 +1,7 @@
 import re
 import time
 from decimal import Decimal, ROUND_UP, ROUND_DOWN
+from functools import partial
 
 import cv2
 import numpy as np
@@ -18,6 +19,8 @@ from src.task.BaseWWTask import isolate_white_text_to_black, binarize_for_matchi
 
 logger = Logger.get_logger(__name__)
 cd_regex = re.compile(r'\d{1,2}\.\d')
+# OCR 需要三通道输入
+isolate_white_text_to_black_bgr = partial(isolate_white_text_to_black, bgr=True)
 
 
 class NotInCombatException(Exception):
@@ -145,7 +148,7 @@ class BaseCombatTask(CombatCheck):
         cds['resonance'] = 0
         cds['liberation'] = 0
         cds['echo'] = 0
-        texts = self.ocr(0.81, 0.86, 0.97, 0.93, frame_processor=isolate_white_text_to_black, match=cd_regex)
+        texts = self.ocr(0.81, 0.86, 0.97, 0.93, frame_processor=isolate_white_text_to_black_bgr, match=cd_regex)
         for text in texts:
             cd = convert_cd(text)
             if text.x < self.width_of_screen(0.86):
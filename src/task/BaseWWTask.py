@@ -1,17 +1,48 @@
+import hashlib
 import math
 import re
+import threading
 import time
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 import numpy as np
 
-from ok import BaseTask, Logger, find_boxes_by_name, og, find_color_rectangles, mask_white
+from ok import BaseTask, Box, Logger, og, find_color_rectangles, mask_white, color_range_to_bound
 from ok import CannotFindException
 import cv2
 
 logger = Logger.get_logger(__name__)
 number_re = re.compile(r'^(\d+)$')
 stamina_re = re.compile(r'^(\d+)/(\d+)$')
+
+
+@lru_cache(maxsize=16)
+def _number_pattern(number):
+    return re.compile(str(number))
+
+
+@lru_cache(maxsize=8)
+def _lang_from_title(title):
+    if '鸣潮' in title:
+        return 'zh_CN'
+    elif 'Wuthering' in title:
+        return 'en_US'
+    elif '鳴潮' in title:
+        return 'zh_TW'
+    return 'unknown_lang'
+
+
+@lru_cache(maxsize=32)
+def read_image_cached(path):
+    """读取并缓存图片，返回的数组为只读，使用方不应修改"""
+    image = cv2.imread(path)
+    if image is not None:
+        image.flags.writeable = False
+    return image
+
+
 f_white_color = {
     'r': (235, 255),  # Red range
     'g': (235, 255),  # Green range
@@ -20,6 +51,175 @@ f_white_color = {
 processed_feature = False
 
 
+def color_percentage(image, lower, upper, box=None):
+    """统计 box 区域内落在 [lower, upper] 范围内的像素占比, box 超出画面的部分会被裁掉"""
+    if box is not None:
+        h, w = image.shape[:2]
+        x1, y1 = max(0, box.x), max(0, box.y)
+        x2, y2 = min(w, box.x + box.width), min(h, box.y + box.height)
+        if x2 <= x1 or y2 <= y1:
+            return 0.0
+        image = image[y1:y2, x1:x2, :3]
+    else:
+        image = image[:, :, :3]
+    total = image.shape[0] * image.shape[1]
+    if total == 0:
+        return 0.0
+    return cv2.countNonZero(cv2.inRange(image, lower, upper)) / total
+
+
+f_white_lower, f_white_upper = color_range_to_bound(f_white_color)
+
+_absorb_re = re.compile(r'(吸收|Absorb)')
+_absorb_pattern_by_lang = {'zh_CN': _absorb_re, 'en_US': _absorb_re, 'zh_TW': _absorb_re}
+
+# 方向查表: 以布尔条件为下标 (False -> 0, True -> 1)
+_FORWARD_BACKWARD = ('w', 's')
+_LEFT_RIGHT = ('a', 'd')
+_OPPOSITE_DIRECTION = {'w': 's', 's': 'w', 'a': 'd', 'd': 'a'}
+
+# rotate_arrow_and_find 粗匹配的角度步长
+_ARROW_COARSE_STEP = 10
+# _get_arrow_rotations 的缓存内容: 原模板 mat (用于判断是否重新加载)、缩放比例、
+# 裁剪偏移、旋转模板及其 UMat/掩码、arrow_correlate 用的模板与掩码矩阵
+ArrowRotations = namedtuple('ArrowRotations', ['mat', 'scale', 'offset', 'rotations', 'umat_rotations',
+                                               'umat_masks', 'template_matrix', 'mask_matrix'])
+# in_team 头像搜索窗口的外扩比例, 与 config.py 的 default_horizontal/vertical_variance 一致
+_IN_TEAM_VARIANCE = 0.002
+# 没有转向时 get_my_angle 复用上次结果的最长时间 (秒)
+_ANGLE_REUSE_TIME = 0.3
+# 箭头区域与上次相比平均每像素灰度差小于该值时视为未变化
+_ARROW_STATIC_DIFF = 1.0
+# 箭头匹配时模板长边的最大像素数, 更大的模板与小地图区域会按比例缩小
+_ARROW_MATCH_SIZE = 32
+# OpenCV 编译了 OpenCL 且可用时, 箭头匹配走 T-API (UMat)
+_USE_OPENCL = cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+
+
+def to_gray(mat):
+    """转为单通道灰度图，已是单通道时原样返回"""
+    if mat.ndim == 2:
+        return mat
+    return cv2.cvtColor(mat[:, :, :3], cv2.COLOR_BGR2GRAY)
+
+
+def normalize_templates(templates, masks=None):
+    """
+    把一组同尺寸的单通道模板展开为 (h*w, N) 的矩阵，每列去均值并归一化到单位长度，
+    供 arrow_correlate 使用。没有纹理的模板整列为 0。
+    给出 masks 时只统计掩码内的像素，掩码外置 0。
+    Returns: (模板矩阵 float32, 掩码矩阵 float64 或 None)
+    """
+    matrix = np.stack([t.reshape(-1) for t in templates], axis=1).astype(np.float32)
+    mask_matrix = None
+    if masks is None:
+        matrix -= matrix.mean(axis=0)
+    else:
+        mask_matrix = np.stack([m.reshape(-1) > 0 for m in masks], axis=1).astype(np.float64)
+        counts = np.maximum(mask_matrix.sum(axis=0), 1)
+        means = (matrix * mask_matrix).sum(axis=0) / counts
+        matrix -= means.astype(np.float32)
+        matrix *= mask_matrix.astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=0)
+    np.divide(matrix, norms, out=matrix, where=norms > 1e-6)
+    matrix[:, norms <= 1e-6] = 0
+    return matrix, mask_matrix
+
+
+def arrow_correlate(template_matrix, roi, h, w, mask_matrix=None):
+    """
+    在 roi 的每个位置上同时计算所有模板的相关系数，结果与 cv2.TM_CCOEFF_NORMED 一致。
+    模板列已去均值，与窗口的点积就等于与去均值窗口的点积，只需再除以窗口自身的范数；
+    有掩码时窗口的均值与范数也只在各模板的掩码内统计。
+    Returns: (位置数, 模板数) 的置信度矩阵，位置按行优先排列。
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(roi, (h, w)).reshape(-1, h * w).astype(np.float32)
+    if mask_matrix is None:
+        sums = windows.sum(axis=1, dtype=np.float64)
+        energy = (np.einsum('ij,ij->i', windows, windows, dtype=np.float64) - sums * sums / (h * w))[:, None]
+    else:
+        windows64 = windows.astype(np.float64)
+        sums = windows64 @ mask_matrix
+        counts = np.maximum(mask_matrix.sum(axis=0), 1)
+        energy = (windows64 * windows64) @ mask_matrix - sums * sums / counts
+    norms = np.sqrt(np.maximum(energy, 0))
+    inv_norms = np.zeros_like(norms)
+    np.divide(1.0, norms, out=inv_norms, where=norms > 1e-6)
+    scores = windows @ template_matrix
+    scores *= inv_norms.astype(np.float32)
+    return scores
+
+
+def crop_to_rotation_extent(mat):
+    """
+    把模板裁剪为以中心为圆心、刚好包住所有非黑像素旋转轨迹的正方形，
+    旋转后不会丢失内容，同时去掉多余的黑边。
+    Returns: (裁剪后的 mat, 裁剪区域在原图中的左上角 (x, y))
+    """
+    (h, w) = mat.shape[:2]
+    ys, xs = np.nonzero(mat)
+    if len(xs) == 0:
+        return mat, (0, 0)
+    cx, cy = w // 2, h // 2
+    r = int(math.ceil(math.sqrt(((xs - cx) ** 2 + (ys - cy) ** 2).max()))) + 1
+    x0, y0 = max(cx - r, 0), max(cy - r, 0)
+    return mat[y0:min(cy + r + 1, h), x0:min(cx + r + 1, w)], (x0, y0)
+
+
+def _same_arrow_roi(roi, last_roi):
+    """
+    箭头区域与上次几乎逐像素相同 (没有转向) 时可以复用上次的结果;
+    旋转不改变灰度直方图, 所以这里比较像素差而不是直方图
+    """
+    return last_roi.shape == roi.shape and cv2.norm(roi, last_roi, cv2.NORM_L1) < _ARROW_STATIC_DIFF * roi.size
+
+
+def team_state(found):
+    """
+    根据三个角色头像文字 (char_N_text) 是否匹配到，推算队伍状态。
+    当前操控的角色不显示头像文字，所以恰有 1 或 2 个匹配到时才算在队伍中。
+    Args:
+        found: 长度为 3 的布尔序列
+    Returns: (是否在队, 当前选中的角色索引, 队伍总人数)
+    """
+    current = -1
+    exist_count = 0
+    for i in range(len(found)):
+        if not found[i]:
+            if current == -1:
+                current = i
+        else:
+            exist_count += 1
+    if exist_count == 2 or exist_count == 1:
+        return True, current, exist_count + 1
+    else:
+        return False, -1, exist_count + 1
+
+
+# 以匹配结果的位掩码 (第 i 位为 char_{i+1}_text) 为下标的 team_state 查表
+TEAM_STATES = tuple(team_state([bool(found >> i & 1) for i in range(3)]) for found in range(8))
+
+
+def direction_to_center(location_x, location_y, screen_width, screen_height, moving):
+    """
+    纯标量计算：从目标点指向屏幕中心的主方向 ('w', 'a', 's', 'd')。
+    moving 为 True 时使用更宽的水平迟滞阈值。
+    """
+    if screen_width <= 0 or screen_height <= 0:
+        # Handle invalid dimensions, default based on horizontal position
+        return _LEFT_RIGHT[location_x >= screen_width / 2]
+    # Calculate vector from point towards the center
+    delta_x = screen_width / 2 - location_x
+    delta_y = screen_height / 2 - location_y
+    abs_x = abs(delta_x)
+    # Determine dominant direction based on vector magnitude
+    if abs_x > abs(delta_y) or abs_x > (0.15 if moving else 0.05) * screen_height:
+        # More horizontal movement needed
+        return _LEFT_RIGHT[delta_x <= 0]
+    # More vertical movement needed (or equal)
+    return _FORWARD_BACKWARD[delta_y <= 0]
+
+
 class BaseWWTask(BaseTask):
     """
     BaseWWTask: 所有鸣潮 (Wuthering Waves) 自动化任务的基类。
@@ -51,6 +251,33 @@ class BaseWWTask(BaseTask):
         self.key_config = self.get_global_config('Game Hotkey Config')  # 游戏热键配置
         self.next_monthly_card_start = 0
         self._logged_in = False
+        self._f_search_box_cache = None  # ((screen_width, screen_height), Box)
+        self._f_text_offsets = {}  # (f.width, f.height) -> search_text_box 偏移
+        self._lang_feature_exists = {}  # get_feature_by_lang 的 feature_exists 结果
+        # 单帧结果缓存: 同一帧内重复的检测只做一次, 帧变化时整体失效
+        self._frame_cache_frame = None
+        self._frame_cache = {}
+        self._bw_mask_buf = None  # bw_frame 复用的缓冲区
+        self._bw_buf = None
+        self._screen_box_cache = {}  # (screen_width, screen_height, x, y, to_x, to_y) -> Box
+        # OCR 结果缓存: 以区域像素摘要为键，画面未变化时跳过 OCR
+        self._ocr_cache = OrderedDict()
+        self._arrow_rotations = None  # 见 _get_arrow_rotations
+        self._arrow_box = None  # 见 _arrow_lookup
+        self._arrow_lookup_size = None
+        self._last_arrow_match = None  # (上次匹配的灰度 roi, rotate_arrow_and_find 的结果), 只在任务线程读写
+        self._char_bundle = None  # 见 _get_char_bundle
+        self._last_angle = None  # get_my_angle 最近一次的结果与识别时间
+        self._last_angle_time = 0
+        # 后台朝向识别线程 (start_angle_tracker), _angle_generation 在每次转向后递增
+        self._angle_lock = threading.Lock()
+        self._angle_stop = threading.Event()
+        self._angle_wakeup = threading.Event()
+        self._angle_thread = None
+        self._angle_pending = None  # submit_frame 交给后台线程的 (generation, arrow, target_box, roi)
+        self._angle_submitted_frame = None
+        self._latest_angle = None
+        self._angle_generation = 0
 
     def is_open_world_auto_combat(self):
         """
@@ -91,10 +318,7 @@ class BaseWWTask(BaseTask):
         """
         返回用于识别“吸收声骸”提示的正则表达式，根据游戏语言动态调整。
         """
-        if self.game_lang == 'zh_CN' or self.game_lang == 'en_US' or self.game_lang == 'zh_TW':
-            return re.compile(r'(吸收|Absorb)')
-        else:
-            return None
+        return _absorb_pattern_by_lang.get(self.game_lang)
 
     @property
     def absorb_echo_feature(self):
@@ -106,10 +330,11 @@ class BaseWWTask(BaseTask):
         例如 feature='absorb' 且语言为 'zh_CN'，则查找 'absorb_zh_CN'。
         """
         lang_feature = feature + '_' + self.game_lang
-        if self.feature_exists(lang_feature):
-            return lang_feature
-        else:
-            return None
+        # 特征集在运行期间不会变化，存在性检查结果可以缓存
+        exists = self._lang_feature_exists.get(lang_feature)
+        if exists is None:
+            exists = self._lang_feature_exists[lang_feature] = bool(self.feature_exists(lang_feature))
+        return lang_feature if exists else None
 
     def set_check_monthly_card(self, next_day=False):
         """
@@ -136,14 +361,45 @@ class BaseWWTask(BaseTask):
         定义搜索“F”交互键提示的屏幕区域。
         通过相对于某个固定UI元素（'pick_up_f_hcenter_vcenter'）的偏移来确定。
         """
+        size = (self.screen_width, self.screen_height)
+        if self._f_search_box_cache is not None and self._f_search_box_cache[0] == size:
+            return self._f_search_box_cache[1]
         f_search_box = self.get_box_by_name('pick_up_f_hcenter_vcenter')
         f_search_box = f_search_box.copy(x_offset=-f_search_box.width * 0.3,
                                          width_offset=f_search_box.width * 0.65,
                                          height_offset=f_search_box.height * 6.5,
                                          y_offset=-f_search_box.height * 5,
                                          name='search_dialog')
+        # 锚点位置只随分辨率变化, 按分辨率缓存
+        self._f_search_box_cache = (size, f_search_box)
         return f_search_box
 
+    def screen_box(self, x, y, to_x, to_y):
+        """box_of_screen 的缓存版本，相对坐标对应的区域只随分辨率变化，返回的 Box 不应被修改"""
+        key = (self.screen_width, self.screen_height, x, y, to_x, to_y)
+        box = self._screen_box_cache.get(key)
+        if box is None:
+            box = self._screen_box_cache[key] = self.box_of_screen(x, y, to_x, to_y)
+        return box
+
+    def find_f(self):
+        """在 f_search_box 中匹配 F 键图标，同一帧内 pick_f / find_f_with_text 共享一次匹配"""
+        return self.frame_cached('find_f', lambda: self.find_one('pick_up_f_hcenter_vcenter', box=self.f_search_box,
+                                                                 threshold=0.8))
+
+    def f_white_percent(self, f):
+        """F 键图标区域内白色像素占比，直接在当前帧的视图上统计，同一帧同一位置只算一次"""
+        return self.frame_cached(('f_white', f.x, f.y, f.width, f.height),
+                                 lambda: self.box_color_percentage(f_white_lower, f_white_upper, f))
+
+    def box_color_percentage(self, lower, upper, box):
+        """在当前帧上统计 box 的颜色占比, 并和 calculate_color_percentage 一样把 box 画到调试层"""
+        percent = color_percentage(self.frame, lower, upper, box)
+        if box is not None:
+            box.confidence = percent
+            self.draw_boxes(box.name, box)
+        return percent
+
     def find_f_with_text(self, target_text=None):
         """
         查找屏幕上带有特定文本的“F”交互提示。
@@ -155,17 +411,17 @@ class BaseWWTask(BaseTask):
         Returns:
             Box对象（如果找到）或 None。
         """
-        f = self.find_one('pick_up_f_hcenter_vcenter', box=self.f_search_box, threshold=0.8)
+        f = self.find_f()
         if not f:
             return None
         if not target_text:
             return f
 
         # 二次确认：检查F键图标内部是否为白色，排除误识别
-        start = time.time()
+        start = time.monotonic()
         percent = 0.0
-        while time.time() - start < 1:
-            percent = self.calculate_color_percentage(f_white_color, f)
+        while time.monotonic() - start < 1:
+            percent = self.f_white_percent(f)
             if percent > 0.5:
                 break
             self.next_frame()
@@ -175,8 +431,12 @@ class BaseWWTask(BaseTask):
 
         # 如果指定了文字，则在F键右侧区域进行OCR识别
         if target_text:
-            search_text_box = f.copy(x_offset=f.width * 5, width_offset=f.width * 7, height_offset=4.5 * f.height,
-                                     y_offset=-0.8 * f.height, name='search_text_box')
+            offsets = self._f_text_offsets.get((f.width, f.height))
+            if offsets is None:
+                offsets = self._f_text_offsets[(f.width, f.height)] = dict(
+                    x_offset=f.width * 5, width_offset=f.width * 7, height_offset=4.5 * f.height,
+                    y_offset=-0.8 * f.height)
+            search_text_box = f.copy(**offsets, name='search_text_box')
             text = self.ocr(box=search_text_box, match=target_text)
             logger.debug(f'found f with text {text}, target_text {target_text}')
             if text:
@@ -201,9 +461,14 @@ class BaseWWTask(BaseTask):
             echo_threshold: YOLO 识别的置信度阈值。
         """
         last_direction = None
-        start = time.time()
+        start = time.monotonic()
         no_echo_start = 0
-        while time.time() - start < time_out:
+        # 屏幕相关的阈值在循环内不变，提前算好
+        center_x = self.width_of_screen(0.5)
+        near_threshold = self.height_of_screen(0.05)
+        far_threshold = self.height_of_screen(0.15) # 迟滞阈值，防止左右反复横跳
+        too_close_y = self.height_of_screen(0.65)
+        while time.monotonic() - start < time_out:
             self.next_frame()
             # 1. 优先检查是否可以直接拾取 (F键)
             if self.pick_f():
@@ -221,8 +486,8 @@ class BaseWWTask(BaseTask):
             if not echos:
                 # 如果没看到声骸，尝试向前走几秒，如果还是没有则放弃
                 if no_echo_start == 0:
-                    no_echo_start = time.time()
-                elif time.time() - no_echo_start > 3:
+                    no_echo_start = time.monotonic()
+                elif time.monotonic() - no_echo_start > 3:
                     self.log_debug(f'walk front to_echo, no echos found, break')
                     break
                 next_direction = 'w'
@@ -230,20 +495,15 @@ class BaseWWTask(BaseTask):
                 # 4. 根据声骸在屏幕上的位置调整行走方向
                 no_echo_start = 0
                 echo = echos[0]
-                center_distance = echo.center()[0] - self.width_of_screen(0.5)
-                threshold = 0.05 if not last_direction else 0.15 # 迟滞阈值，防止左右反复横跳
+                center_distance = echo.center()[0] - center_x
+                threshold = far_threshold if last_direction else near_threshold
                 
-                # 如果水平距离足够近，则向前(W)或向后(S)
-                if abs(center_distance) < self.height_of_screen(threshold):
-                    if echo.y + echo.height > self.height_of_screen(0.65): # 目标太靠下（太近或在身后），后退
-                        next_direction = 's'
-                    else:
-                        next_direction = 'w'
+                # 如果水平距离足够近，则向前(W)或向后(S)，目标太靠下（太近或在身后）时后退
                 # 否则向左(A)或向右(D)调整
-                elif center_distance > 0:
-                    next_direction = 'd'
+                if abs(center_distance) < threshold:
+                    next_direction = _FORWARD_BACKWARD[echo.y + echo.height > too_close_y]
                 else:
-                    next_direction = 'a'
+                    next_direction = _LEFT_RIGHT[center_distance > 0]
             last_direction = self._walk_direction(last_direction, next_direction)
             if update_function is not None:
                 update_function()
@@ -260,8 +520,8 @@ class BaseWWTask(BaseTask):
     def _stop_last_direction(self, last_direction):
         """停止当前的移动"""
         if last_direction:
+            # 按键抬起是同步发送的，无需额外等待
             self.send_key_up(last_direction)
-            self.sleep(0.01)
         return None
 
     def walk_to_box(self, find_function, time_out=30, end_condition=None, y_offset=0.05, x_threshold=0.07,
@@ -269,9 +529,9 @@ class BaseWWTask(BaseTask):
         """
         通用的寻路函数：根据 find_function 找到的目标不断调整位置，直到满足 end_condition。
         """
-        start = time.time()
-        while time.time() - start < time_out:
-            if ended := self.do_walk_to_box(find_function, time_out=time_out - (time.time() - start),
+        start = time.monotonic()
+        while time.monotonic() - start < time_out:
+            if ended := self.do_walk_to_box(find_function, time_out=time_out - (time.monotonic() - start),
                                             end_condition=end_condition, y_offset=y_offset,
                                             x_threshold=x_threshold, use_hook=use_hook):
                 return ended
@@ -293,12 +553,21 @@ class BaseWWTask(BaseTask):
             self.wait_until(lambda: (not end_condition or end_condition()) or find_function(), raise_if_not_found=True,
                             time_out=time_out)
         last_direction = None
-        start = time.time()
+        start = time.monotonic()
         ended = False
         running = False
+        wall_check_count = 0
+        wall_negatives = 0
         last_target = None
         centered = False
-        while time.time() - start < time_out:
+        center_x = self.width_of_screen(0.5)
+        center_threshold = self.width_of_screen(0.04)
+        moving_threshold = self.width_of_screen(x_threshold)
+        y_offset_px = self.height_of_screen(y_offset)
+        # 已对齐后前后调整的分界线，按上一次方向设置迟滞
+        center_y = {'s': self.height_of_screen(0.45), 'w': self.height_of_screen(0.6)}
+        center_y_default = self.height_of_screen(0.5)
+        while time.monotonic() - start < time_out:
             self.next_frame()
             if end_condition:
                 ended = end_condition()
@@ -322,47 +591,37 @@ class BaseWWTask(BaseTask):
                 self.log_info('find_function not found, change to opposite direction')
             else:
                 x, y = last_target.center()
-                y = max(0, y - self.height_of_screen(y_offset))
-                x_abs = abs(x - self.width_of_screen(0.5))
-                threshold = 0.04 if not last_direction else x_threshold
+                y = max(0, y - y_offset_px)
+                threshold = moving_threshold if last_direction else center_threshold
                 
                 # 判断是否水平对齐
-                centered = centered or x_abs <= self.width_of_screen(threshold)
+                centered = centered or abs(x - center_x) <= threshold
                 if not centered:
                     # 未对齐，左右调整
-                    if x > self.width_of_screen(0.5):
-                        next_direction = 'd'
-                    else:
-                        next_direction = 'a'
+                    next_direction = _LEFT_RIGHT[x > center_x]
                 else:
                     # 已对齐，前后调整
-                    if last_direction == 's':
-                        center = 0.45
-                    elif last_direction == 'w':
-                        center = 0.6
-                    else:
-                        center = 0.5
-                    if y > self.height_of_screen(center):
-                        next_direction = 's'
-                    else:
-                        next_direction = 'w'
+                    next_direction = _FORWARD_BACKWARD[y > center_y.get(last_direction, center_y_default)]
             
             # 执行按键操作
-            if next_direction != last_direction:
-                if last_direction:
-                    self.send_key_up(last_direction)
-                    self.sleep(0.001)
-                last_direction = next_direction
-                if next_direction:
-                    self.send_key_down(next_direction)
+            last_direction = self._walk_direction(last_direction, next_direction)
             
             # 跑步控制 (Shift) - 当在墙上时自动爬墙
             if running:
-                if not self.find_one('on_the_wall', threshold=0.7):
-                    self.log_info('not on the wall, stop running')
-                    self.mouse_up(key='right')
+                # 爬墙中每 5 帧确认一次，出现未检测到后逐帧确认，连续 3 次未检测到才停止，避免单帧误判
+                wall_check_count += 1
+                if wall_negatives or wall_check_count % 5 == 0:
+                    if self.find_one_cached('on_the_wall', threshold=0.7):
+                        wall_negatives = 0
+                    else:
+                        wall_negatives += 1
+                        if wall_negatives >= 3:
+                            self.log_info('not on the wall, stop running')
+                            self.mouse_up(key='right')
+                            running = False
+                            wall_negatives = 0
             else:
-                if next_direction == 'w' and self.find_one('on_the_wall', threshold=0.7):
+                if next_direction == 'w' and self.find_one_cached('on_the_wall', threshold=0.7):
                     self.log_info('on the wall, start running')
                     running = True
                     self.mouse_down(key='right')
@@ -370,15 +629,13 @@ class BaseWWTask(BaseTask):
             
             # 钩锁使用
             if use_hook and next_direction == 'w':
-                if self.find_one('tool_teleport', 0.75):
+                if self.find_one_cached('tool_teleport', horizontal_variance=0.75):
                     self.send_key(self.key_config['Tool Key'])
                     self.sleep(3)
                     continue
         
         # 停止所有动作
-        if last_direction:
-            self.send_key_up(last_direction)
-            self.sleep(0.001)
+        self._stop_last_direction(last_direction)
         if running:
             self.send_key_up('shift')
         if not end_condition:
@@ -387,43 +644,18 @@ class BaseWWTask(BaseTask):
             return ended
 
     def opposite_direction(self, direction):
-        if direction == 'w':
-            return 's'
-        elif direction == 's':
-            return 'w'
-        elif direction == 'a':
-            return 'd'
-        elif direction == 'd':
-            return 'a'
-        else:
-            return 'w'
+        return _OPPOSITE_DIRECTION.get(direction, 'w')
 
     def get_direction(self, location_x, location_y, screen_width, screen_height, centered, current_direction):
         """
         根据目标点坐标，计算应该往哪个方向走 ('w', 'a', 's', 'd')。
         简单的象限判断逻辑。
         """
-        if screen_width <= 0 or screen_height <= 0:
-            # Handle invalid dimensions, default based on horizontal position
-            return "a" if location_x < screen_width / 2 else "d"
-        center_x = screen_width / 2
-        center_y = screen_height / 2
-        # Calculate vector from point towards the center
-        delta_x = center_x - location_x
-        delta_y = center_y - location_y
-        # Determine dominant direction based on vector magnitude
-        direction = None
-        if (abs(delta_x) > abs(delta_y) or (not current_direction and abs(delta_x) > 0.05 * screen_height)
-                or abs(delta_x) > 0.15 * screen_height):
-            # More horizontal movement needed
-            return "a" if delta_x > 0 else "d"
-
-            # More vertical movement needed (or equal)
-        return "w" if delta_y > 0 else "s"
+        return direction_to_center(location_x, location_y, screen_width, screen_height, bool(current_direction))
 
     def find_treasure_icon(self):
         """在屏幕中央区域寻找宝箱图标"""
-        return self.find_one('treasure_icon', box=self.box_of_screen(0.18, 0.1, 0.82, 0.81), threshold=0.7)
+        return self.find_one_cached('treasure_icon', box=self.box_of_screen(0.18, 0.1, 0.82, 0.81), threshold=0.7)
 
     def click(self, x=-1, y=-1, move_back=False, name=None, interval=-1, move=True, down_time=0.01, after_sleep=0,
               key="left"):
@@ -458,20 +690,61 @@ class BaseWWTask(BaseTask):
                 return cost
         return 0
 
+    def frame_cached(self, key, func):
+        """
+        同一帧内只计算一次 func() 并缓存结果，key 用于区分不同的检测。
+        持有帧对象本身作为缓存标识，帧切换后缓存自动清空。
+        """
+        frame = self.frame
+        if frame is not self._frame_cache_frame:
+            self._frame_cache_frame = frame
+            self._frame_cache.clear()
+        if key in self._frame_cache:
+            return self._frame_cache[key]
+        value = self._frame_cache[key] = func()
+        return value
+
+    def find_one_cached(self, feature_name, box=None, **kwargs):
+        """
+        find_one 的单帧缓存版本：同一帧内相同特征、区域与参数的匹配只执行一次。
+        用于寻路循环里每帧都会查询的特征 (on_the_wall, tool_teleport, treasure_icon 等)。
+        """
+        box_key = None if box is None else (box.x, box.y, box.width, box.height)
+        key = ('find_one', feature_name, box_key, tuple(sorted(kwargs.items())))
+        return self.frame_cached(key, lambda: self.find_one(feature_name, box=box, **kwargs))
+
+    def bw_frame(self):
+        """
+        当前帧的黑白 (convert_bw(bgr=True)) 图像，每帧只转换一次。
+        用作 find_one 的 frame 参数，ok 会按 [:, :, :3] 切片，所以保持三通道。
+        """
+        return self.frame_cached('bw_frame', self._convert_bw_frame)
+
+    def _convert_bw_frame(self):
+        """与 convert_bw(bgr=True) 相同，但写入预分配的缓冲区，避免每帧分配整帧大小的数组"""
+        frame = self.frame
+        shape = frame.shape[:2]
+        if self._bw_mask_buf is None or self._bw_mask_buf.shape != shape:
+            self._bw_mask_buf = np.empty(shape, dtype=np.uint8)
+            self._bw_buf = np.empty(shape + (3,), dtype=np.uint8)
+        self._bw_mask_buf = cv2.inRange(frame, lower_white, upper_white, dst=self._bw_mask_buf)
+        self._bw_buf = cv2.cvtColor(self._bw_mask_buf, cv2.COLOR_GRAY2BGR, dst=self._bw_buf)
+        return self._bw_buf
+
+    def find_one_bw(self, feature_name, threshold):
+        """在黑白帧上匹配模板，结果在同一帧内共享"""
+        return self.frame_cached(('find_one_bw', feature_name, threshold),
+                                 lambda: self.find_one(feature_name, threshold=threshold, frame=self.bw_frame()))
+
     def in_realm(self):
         """判断是否在副本 (Realm/Domain) 中"""
-        return not bool(getattr(self, 'treat_as_not_in_realm', False)) and self.find_one('illusive_realm_exit',
-                                                                                         threshold=0.7,
-                                                                                         frame_processor=convert_bw) and self.in_team() and not self.find_one(
-            'world_earth_icon', threshold=0.55,
-            frame_processor=convert_bw)
+        return not bool(getattr(self, 'treat_as_not_in_realm', False)) and self.find_one_bw(
+            'illusive_realm_exit', 0.7) and self.in_team() and not self.find_one_bw('world_earth_icon', 0.55)
 
     def in_world(self):
         """判断是否在大世界 (Overworld)"""
-        return self.find_one('world_earth_icon', threshold=0.55,
-                             frame_processor=convert_bw) and self.in_team() and not self.find_one('illusive_realm_exit',
-                                                                                                  threshold=0.7,
-                                                                                                  frame_processor=convert_bw)
+        return self.find_one_bw('world_earth_icon', 0.55) and self.in_team() and not self.find_one_bw(
+            'illusive_realm_exit', 0.7)
 
     def in_illusive_realm(self):
         """判断是否在深塔/肉鸽 (Illusive Realm) 菜单"""
@@ -501,26 +774,48 @@ class BaseWWTask(BaseTask):
         else:
             return True
 
+    def _roi_digest(self, box):
+        roi = self.frame[box.y:box.y + box.height, box.x:box.x + box.width]
+        return hashlib.blake2b(np.ascontiguousarray(roi).data, digest_size=16).digest()
+
+    def cached_ocr(self, x, y, to_x, to_y, match, cache_size=64):
+        """
+        带缓存的 wait_ocr：区域像素与上次识别时完全一致则直接返回上次结果。
+        只缓存识别成功的结果，缓存键包含区域位置和匹配规则。
+        """
+        box = self.box_of_screen(x, y, to_x, to_y)
+        match_key = tuple(m.pattern if isinstance(m, re.Pattern) else m for m in match)
+        key = (self._roi_digest(box), box.x, box.y, box.width, box.height, match_key)
+        if key in self._ocr_cache:
+            self._ocr_cache.move_to_end(key)
+            return self._ocr_cache[key]
+        boxes = self.wait_ocr(x, y, to_x, to_y, raise_if_not_found=False, match=match)
+        if boxes:
+            # wait_ocr 可能换了帧，用识别成功时的帧重新计算摘要
+            key = (self._roi_digest(box),) + key[1:]
+            self._ocr_cache[key] = boxes
+            if len(self._ocr_cache) > cache_size:
+                self._ocr_cache.popitem(last=False)
+        return boxes
+
     def get_stamina(self):
         """
         使用 OCR 获取当前体力和备用体力。
         Returns: (当前体力, 备用体力, 总和)
         """
-        boxes = self.wait_ocr(0.49, 0.0, 0.92, 0.10, raise_if_not_found=False,
-                              match=[number_re, stamina_re])
+        boxes = self.cached_ocr(0.49, 0.0, 0.92, 0.10, match=[number_re, stamina_re])
         if not boxes:
             self.screenshot('stamina_error')
             return -1, -1, -1
-        current_box = find_boxes_by_name(boxes, stamina_re)
-        if current_box:
-            current = int(current_box[0].name.split('/')[0])
-        else:
-            current = 0
-        back_up_box = find_boxes_by_name(boxes, number_re)
-        if back_up_box:
-            back_up = int(back_up_box[0].name)
-        else:
-            back_up = 0
+        # 一次遍历同时取出 "当前/上限" 与备用体力, 各取第一个匹配
+        current = back_up = None
+        for box in boxes:
+            if current is None and (m := stamina_re.match(box.name)):
+                current = int(m.group(1))
+            elif back_up is None and (m := number_re.match(box.name)):
+                back_up = int(m.group(1))
+        current = current or 0
+        back_up = back_up or 0
         self.info_set('current_stamina', current)
         self.info_set('back_up_stamina', back_up)
         return current, back_up, current + back_up
@@ -537,7 +832,7 @@ class BaseWWTask(BaseTask):
             used: 实际消耗的体力。
         """
         self.sleep(1)
-        double = self.ocr(0.55, 0.56, 0.75, 0.69, match=[re.compile(str(once * 2))])
+        double = self.ocr(0.55, 0.56, 0.75, 0.69, match=[_number_pattern(once * 2)])
         current, back_up, total = self.get_stamina()
         y = 0.62
         # 判断是否有双倍掉落活动
@@ -659,7 +954,7 @@ class BaseWWTask(BaseTask):
 
     def test_absorb(self):
         # self.set_image('tests/images/absorb.png')
-        image = cv2.imread('tests/images/absorb.png')
+        image = read_image_cached('tests/images/absorb.png')
         result = self.executor.ocr_lib(image, use_det=True, use_cls=False, use_rec=True)
         self.logger.info(f'ocr_result {result}')
 
@@ -672,6 +967,10 @@ class BaseWWTask(BaseTask):
         Returns:
             list: 包含声骸位置信息的 Box 列表。
         """
+        # 同一帧只推理一次，帧未更新时直接复用上次结果
+        return self.frame_cached(('find_echos', threshold), lambda: self._detect_echos(threshold))
+
+    def _detect_echos(self, threshold):
         # Load the ONNX model
         ret = og.my_app.yolo_detect(self.frame, threshold=threshold, label=0) # label=0 通常指声骸类
 
@@ -705,7 +1004,7 @@ class BaseWWTask(BaseTask):
         通用的按F键拾取/交互。
         不检查文本，只要有F提示就按。
         """
-        if self.find_one('pick_up_f_hcenter_vcenter', box=self.f_search_box, threshold=0.8):
+        if self.find_f():
             self.send_key('f', after_sleep=0.8)
             if not handle_claim:
                 return True
@@ -741,21 +1040,24 @@ class BaseWWTask(BaseTask):
         for i in range(4):
             if turn:
                 self.center_camera() # 视角归中
-            echos = self.find_echos(threshold=threshold)
-            max_echo_count = max(max_echo_count, len(echos))
-            self.log_debug(f'max_echo_count {max_echo_count}')
-            if echos:
-                self.log_info(f'yolo found echo {echos}')
-                # 找到后走过去
-                return self.walk_to_yolo_echo(update_function=update_function, time_out=time_out), max_echo_count > 1
-            
-            # (可选) 颜色识别作为兜底
+            # (可选) 颜色识别：先做廉价的颜色预筛，正前方明显没有声骸颜色时跳过本方向的 YOLO 推理
+            color_percent = None
             if use_color:
-                color_percent = self.calculate_color_percentage(echo_color, front_box)
+                color_percent = self.box_color_percentage(echo_lower, echo_upper, front_box)
                 self.log_debug(f'pick_echo color_percent:{color_percent}')
-                if color_percent > color_threshold:
-                    self.log_debug(f'found color_percent {color_percent} > {color_threshold}, walk now')
-                    return self.walk_to_yolo_echo(update_function=update_function), max_echo_count > 1
+            if color_percent is None or color_percent >= color_threshold / 2:
+                echos = self.find_echos(threshold=threshold)
+                max_echo_count = max(max_echo_count, len(echos))
+                self.log_debug(f'max_echo_count {max_echo_count}')
+                if echos:
+                    self.log_info(f'yolo found echo {echos}')
+                    # 找到后走过去
+                    return self.walk_to_yolo_echo(update_function=update_function, time_out=time_out), max_echo_count > 1
+            
+            # 颜色识别作为兜底
+            if color_percent is not None and color_percent > color_threshold:
+                self.log_debug(f'found color_percent {color_percent} > {color_threshold}, walk now')
+                return self.walk_to_yolo_echo(update_function=update_function), max_echo_count > 1
             if not turn and i == 0:
                 return False, max_echo_count > 1
             self.send_key('a', down_time=0.05) # 稍微转一点
@@ -767,6 +1069,7 @@ class BaseWWTask(BaseTask):
     def center_camera(self):
         """按下鼠标中键，重置视角朝向"""
         self.click(0.5, 0.5, down_time=0.2, key='middle')
+        self.invalidate_my_angle()
         self.wait_until(self.in_combat, time_out=1)
 
     def turn_direction(self, direction):
@@ -838,12 +1141,13 @@ class BaseWWTask(BaseTask):
         """处理登录界面"""
         if not self._logged_in:
             if self.find_one('login_account', vertical_variance=0.1, threshold=0.7):
-                self.wait_until(lambda: self.find_one('login_account', threshold=0.7) is None,
-                                pre_action=lambda: self.click_relative(0.5, 0.9, after_sleep=3), time_out=30)
-                self.wait_until(lambda: self.find_one('monthly_card', threshold=0.7) or self.in_team_and_world(),
-                                pre_action=lambda: self.click_relative(0.5, 0.9, after_sleep=3), time_out=120)
-                self.wait_until(lambda: self.in_team_and_world(),
-                                post_action=lambda: self.click_relative(0.5, 0.9, after_sleep=3), time_out=5)
+                self.wait_until_adaptive(lambda: self.find_one('login_account', threshold=0.7) is None,
+                                         pre_action=lambda: self.click_relative(0.5, 0.9, after_sleep=3), time_out=30)
+                self.wait_until_adaptive(
+                    lambda: self.find_one('monthly_card', threshold=0.7) or self.in_team_and_world(),
+                    pre_action=lambda: self.click_relative(0.5, 0.9, after_sleep=3), time_out=120)
+                self.wait_until_adaptive(lambda: self.in_team_and_world(),
+                                         post_action=lambda: self.click_relative(0.5, 0.9, after_sleep=3), time_out=5)
                 self.log_info('Auto Login Success', notify=True)
                 self._logged_in = True
                 self.sleep(3)
@@ -853,65 +1157,264 @@ class BaseWWTask(BaseTask):
                 self.log_info('点击登录按钮!')
                 return False
 
+    def wait_until_adaptive(self, condition, time_out=0, pre_action=None, post_action=None, settle_time=-1,
+                            initial=0.1, cap=1.0):
+        """
+        与 wait_until 相同，但两次检测之间的间隔从 initial 秒开始翻倍，最长 cap 秒。
+        用于登录、弹窗等长时间等待，减少无效的截图与模板匹配。
+        条件满足后若需要 settle_time，确认期间恢复为最短间隔。
+        """
+        start = time.monotonic()
+        delay = initial
+        stable_start = None
+        while True:
+            if pre_action is not None:
+                pre_action()
+            self.next_frame()
+            result = condition()
+            now = time.monotonic()
+            if result:
+                if settle_time <= 0:
+                    return result
+                if stable_start is None:
+                    stable_start = now
+                elif now - stable_start >= settle_time:
+                    return result
+                delay = initial
+            else:
+                stable_start = None
+            if now - start >= time_out:
+                return None
+            if post_action is not None:
+                post_action()
+            self.sleep(min(delay, max(start + time_out - time.monotonic(), 0)))
+            delay = min(delay * 2, cap)
+
     def in_team_and_world(self):
         """同时检查在队伍中且在大世界（非菜单、非过场动画）"""
         return self.in_team()[
             0]  # and self.find_one(f'gray_book_button', threshold=0.7, canny_lower=50, canny_higher=150)
 
     def get_angle_between(self, my_angle, angle):
-        """计算两个角度之间的差值"""
-        if my_angle > angle:
-            to_turn = angle - my_angle
-        else:
-            to_turn = -(my_angle - angle)
-        if to_turn > 180:
-            to_turn -= 360
-        elif to_turn < -180:
-            to_turn += 360
-        return to_turn
+        """计算两个角度之间的差值，结果归一化到 [-180, 180)"""
+        return (angle - my_angle + 540) % 360 - 180
 
     def get_my_angle(self):
-        """获取当前角色在小地图上的朝向角度"""
-        return self.rotate_arrow_and_find()[0]
-
-    def rotate_arrow_and_find(self):
         """
-        通过旋转小地图箭头模板，匹配当前箭头角度。
+        获取当前角色在小地图上的朝向角度。
+        距上次识别不足 _ANGLE_REUSE_TIME 秒且期间没有转向时直接复用上次的结果。
+        """
+        if self._angle_thread is not None:
+            self.submit_frame()
+            with self._angle_lock:
+                angle = self._latest_angle
+            if angle is not None:
+                return angle
+        now = time.monotonic()
+        if self._last_angle is not None and now - self._last_angle_time < _ANGLE_REUSE_TIME:
+            return self._last_angle
+        self._last_angle = self.rotate_arrow_and_find()[0]
+        self._last_angle_time = now
+        return self._last_angle
+
+    def invalidate_my_angle(self):
+        """转向或重置视角后调用，下次 get_my_angle 重新识别"""
+        self._last_angle = None
+        self._last_arrow_match = None
+        self._angle_submitted_frame = None
+        with self._angle_lock:
+            self._latest_angle = None
+            self._angle_generation += 1
+
+    def start_angle_tracker(self, interval=0.1):
+        """
+        启动后台线程识别朝向，get_my_angle 把当前帧的箭头区域交给它，并直接返回最新结果。
+        后台线程每 interval 秒最多识别一次，只处理任务线程交来的快照，不访问 self.frame。
+        只应在寻路移动期间开启，战斗等场景前调用 stop_angle_tracker。
+        """
+        if self._angle_thread is not None:
+            return
+        self._angle_stop.clear()
+        self._angle_wakeup.clear()
+        self._angle_thread = threading.Thread(target=self._angle_worker, args=(interval,), name='angle_tracker',
+                                              daemon=True)
+        self._angle_thread.start()
+
+    def stop_angle_tracker(self):
+        """停止后台朝向识别线程"""
+        if self._angle_thread is None:
+            return
+        self._angle_stop.set()
+        self._angle_wakeup.set()
+        self._angle_thread.join()
+        self._angle_thread = None
+        self._angle_submitted_frame = None
+        with self._angle_lock:
+            self._angle_pending = None
+            self._latest_angle = None
+
+    def submit_frame(self, frame=None):
+        """在任务线程上裁出 frame (默认当前帧) 的箭头区域，交给后台朝向识别线程; 同一帧只提交一次"""
+        if self._angle_thread is None:
+            return
+        if frame is None:
+            frame = self.frame
+        if frame is None or frame is self._angle_submitted_frame:
+            return
+        self._angle_submitted_frame = frame
+        arrow, target_box, roi = self._arrow_roi(frame)
+        with self._angle_lock:
+            self._angle_pending = (self._angle_generation, arrow, target_box, roi)
+            self._angle_wakeup.set()
+
+    def _angle_worker(self, interval):
+        # 本线程自己的 (roi, 角度) 缓存，与任务线程的 _last_arrow_match 互不影响
+        last = None
+        while not self._angle_stop.is_set():
+            if not self._angle_wakeup.wait(interval):
+                continue
+            with self._angle_lock:
+                self._angle_wakeup.clear()
+                pending, self._angle_pending = self._angle_pending, None
+            if pending is None:
+                continue
+            generation, arrow, target_box, roi = pending
+            try:
+                if last is not None and _same_arrow_roi(roi, last[0]):
+                    angle = last[1]
+                else:
+                    angle = self._match_arrow_rotations(arrow, target_box, roi)[0]
+                    last = (roi, angle)
+            except Exception as e:
+                logger.error('angle tracker exception', e)
+                continue
+            with self._angle_lock:
+                # 快照交出后发生了转向, 结果已过期
+                if generation == self._angle_generation:
+                    self._latest_angle = angle
+            self._angle_stop.wait(interval)
+
+    def rotate_arrow_and_find(self, frame=None):
+        """
+        通过旋转小地图箭头模板，匹配 frame (默认当前帧) 中的箭头角度。
         这是判断角色朝向的关键技术。
+        默认用 arrow_correlate 一次算出全部 360 个角度；走 OpenCL 时
+        先每 10° 粗匹配，再在置信度最高的两个角度附近逐度细化，匹配次数约 70 次。
         """
-        arrow_template = self.get_feature_by_name('arrow')
-        original_mat = arrow_template.mat
-        max_conf = 0
-        max_angle = 0
-        max_target = None
-        max_mat = None
-        (h, w) = arrow_template.mat.shape[:2]
-        # self.log_debug(f'turn_east h:{h} w:{w}')
-        center = (w // 2, h // 2)
-        target_box = self.get_box_by_name('arrow')
-        # if self.debug:
-        #     self.screenshot('arrow_original', original_ mat)
-        for angle in range(0, 360):
-            # Rotate the template image
-            rotation_matrix = cv2.getRotationMatrix2D(center, -angle, 1.0)
-            template = cv2.warpAffine(original_mat, rotation_matrix, (w, h))
-            # mask = np.where(np.all(template == [0, 0, 0], axis=2), 0, 255).astype(np.uint8)
-
-            target = self.find_one(box=target_box,
-                                   template=template, threshold=0.01)
-            # if self.debug and angle % 90 == 0:
-            #     self.screenshot(f'arrow_rotated_{angle}', arrow_template.mat)
-            if target and target.confidence > max_conf:
-                max_conf = target.confidence
-                max_angle = angle
-                max_target = target
-                # max_mat = template
-        # arrow_template.mat = original_mat
-        # arrow_template.mask = None
-        # if self.debug and max_mat is not None:
-        #     self.screenshot('max_mat',frame=max_mat)
-        # self.log_debug(f'turn_east max_conf: {max_conf} {max_angle}')
-        return max_angle, max_target
+        arrow, target_box, roi = self._arrow_roi(self.frame if frame is None else frame)
+        # 箭头区域与上次几乎逐像素相同 (没有转向) 时直接复用上次的结果
+        last = self._last_arrow_match
+        if last is not None and _same_arrow_roi(roi, last[0]):
+            return last[1]
+        result = self._match_arrow_rotations(arrow, target_box, roi)
+        self._last_arrow_match = (roi, result)
+        return result
+
+    def _arrow_roi(self, frame):
+        """裁出 frame 中的小地图箭头区域，返回 (箭头模板缓存, 'arrow' 区域, 灰度 roi)"""
+        arrow, target_box = self._arrow_lookup()
+        # 小地图区域只裁剪并转灰度一次，所有角度共用; 单通道匹配的计算量为 BGR 的 1/3
+        roi = cv2.cvtColor(frame[target_box.y:target_box.y + target_box.height,
+                           target_box.x:target_box.x + target_box.width, :3], cv2.COLOR_BGR2GRAY)
+        if arrow.scale < 1:
+            # 朝向只需 1° 精度, 缩小后匹配不影响角度, 像素量按 scale² 减少
+            roi = cv2.resize(roi, None, fx=arrow.scale, fy=arrow.scale, interpolation=cv2.INTER_AREA)
+        return arrow, target_box, roi
+
+    def _match_arrow_rotations(self, arrow, target_box, roi):
+        """在已裁剪、缩放的灰度 roi 上匹配全部旋转模板，返回 (角度, Box)"""
+        scale = arrow.scale
+        (h, w) = arrow.mat.shape[:2]
+        (rh, rw) = arrow.rotations[0].shape[:2]
+        if roi.shape[0] < rh or roi.shape[1] < rw:
+            return 0, None
+
+        def to_box(conf, loc):
+            # 匹配位置是裁剪后模板的左上角, 换算回完整模板在屏幕上的位置
+            return Box(target_box.x + round(loc[0] / scale) - arrow.offset[0],
+                       target_box.y + round(loc[1] / scale) - arrow.offset[1], w, h,
+                       confidence=conf, name='arrow')
+
+        if not _USE_OPENCL:
+            # 一次矩阵乘法得到每个位置、每个角度的相关系数, 没有逐角度的 Python 调用
+            scores = arrow_correlate(arrow.template_matrix, roi, rh, rw, arrow.mask_matrix)
+            positions = scores.argmax(axis=0)
+            confs = scores[positions, np.arange(scores.shape[1])]
+            best_angle = int(confs.argmax())
+            best_conf = float(confs[best_angle])
+            if best_conf < 0.01:
+                return 0, None
+            y, x = divmod(int(positions[best_angle]), roi.shape[1] - rw + 1)
+            return best_angle, to_box(best_conf, (x, y))
+
+        # T-API: ROI 只上传一次, 模板已常驻显存, 匹配由 OpenCL 执行
+        roi = cv2.UMat(roi)
+
+        def match_at_angle(angle):
+            result = cv2.matchTemplate(roi, arrow.umat_rotations[angle], cv2.TM_CCOEFF_NORMED,
+                                       mask=arrow.umat_masks[angle]).get()
+            # 带掩码时平坦区域的分母为 0, 会得到 inf/nan
+            np.nan_to_num(result, copy=False, nan=0, posinf=0, neginf=0)
+            _, conf, _, loc = cv2.minMaxLoc(result)
+            if conf < 0.01:
+                return 0, angle, None
+            return conf, angle, to_box(conf, loc)
+
+        # 粗匹配, 保留前两名以应对箭头形状近似对称造成的并列峰值
+        coarse = sorted((match_at_angle(angle) for angle in range(0, 360, _ARROW_COARSE_STEP)),
+                        key=lambda m: m[0], reverse=True)[:2]
+        best_conf, best_angle, best_target = coarse[0]
+        searched = set(range(0, 360, _ARROW_COARSE_STEP))
+        for _, peak, _ in coarse:
+            for offset in range(1 - _ARROW_COARSE_STEP, _ARROW_COARSE_STEP):
+                angle = (peak + offset) % 360
+                if angle in searched:
+                    continue
+                searched.add(angle)
+                conf, angle, target = match_at_angle(angle)
+                if conf > best_conf:
+                    best_conf, best_angle, best_target = conf, angle, target
+        return best_angle, best_target
+
+    def _arrow_lookup(self):
+        """
+        箭头模板缓存与 'arrow' 区域，只在分辨率变化 (特征随之重新缩放) 时重新查询，
+        避免每次识别朝向都查一遍特征表。
+        """
+        size = (self.screen_width, self.screen_height)
+        if self._arrow_lookup_size != size:
+            self._arrow_box = self.get_box_by_name('arrow')
+            self._get_arrow_rotations()
+            self._arrow_lookup_size = size
+        return self._arrow_rotations, self._arrow_box
+
+    def _get_arrow_rotations(self):
+        """
+        箭头模板的 360 个旋转结果与掩码，首次使用时生成，模板重新加载后重建。
+        模板先转为灰度并裁掉旋转用不到的黑边，较大时再缩小到长边不超过 _ARROW_MATCH_SIZE，然后旋转。
+        黑色像素 (背景与旋转后露出的角落) 不参与匹配。
+        """
+        original_mat = self.get_feature_by_name('arrow').mat
+        if self._arrow_rotations is None or self._arrow_rotations.mat is not original_mat:
+            mat, offset = crop_to_rotation_extent(to_gray(original_mat))
+            scale = min(1.0, _ARROW_MATCH_SIZE / max(mat.shape[:2]))
+            if scale < 1:
+                mat = cv2.resize(mat, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            mask = np.where(mat > 0, 255, 0).astype(np.uint8)
+            (h, w) = mat.shape[:2]
+            center = (w // 2, h // 2)
+            matrices = [cv2.getRotationMatrix2D(center, -angle, 1.0) for angle in range(360)]
+            rotations = tuple(cv2.warpAffine(mat, m, (w, h)) for m in matrices)
+            masks = tuple(cv2.warpAffine(mask, m, (w, h), flags=cv2.INTER_NEAREST) for m in matrices)
+            umat_rotations = umat_masks = template_matrix = mask_matrix = None
+            if _USE_OPENCL:
+                umat_rotations = tuple(cv2.UMat(rotation) for rotation in rotations)
+                umat_masks = tuple(cv2.UMat(m) for m in masks)
+            else:
+                template_matrix, mask_matrix = normalize_templates(rotations, masks)
+            self._arrow_rotations = ArrowRotations(original_mat, scale, offset, rotations, umat_rotations,
+                                                   umat_masks, template_matrix, mask_matrix)
+        return self._arrow_rotations
 
     def get_mini_map_turn_angle(self, feature, threshold=0.72, x_offset=0, y_offset=0):
         """
@@ -962,6 +1465,7 @@ class BaseWWTask(BaseTask):
                 self.sleep(0.1)
                 self.middle_click(down_time=0.1)
                 self.send_key_up(minor_adjust)
+                self.invalidate_my_angle()
                 self.sleep(0.01)
                 # Tell the caller to continue to the next loop iteration
                 return current_direction, current_adjust, True
@@ -1000,32 +1504,52 @@ class BaseWWTask(BaseTask):
     def in_team(self):
         """
         检测右侧角色头像，判断是否在队伍中。
+        同一帧内只检测一次，in_realm / in_world / has_claim 等多处调用共享结果。
         Returns: (是否在队, 当前选中的角色索引, 队伍总人数)
         """
-        c1 = self.find_one('char_1_text',
-                           threshold=0.8)
-        c2 = self.find_one('char_2_text',
-                           threshold=0.8)
-        c3 = self.find_one('char_3_text',
-                           threshold=0.8)
-        arr = [c1, c2, c3]
-        # logger.debug(f'in_team check {arr}')
-        current = -1
-        exist_count = 0
-        for i in range(len(arr)):
-            if arr[i] is None:
-                if current == -1:
-                    current = i
-            else:
-                exist_count += 1
-        if exist_count == 2 or exist_count == 1:
+        return self.frame_cached('in_team', self._detect_in_team)
+
+    def _detect_in_team(self):
+        # 三个头像区域只从帧中裁剪一次, 各模板在共享 ROI 内自己的搜索窗口里匹配;
+        # 0.8 的阈值是按彩色匹配调的, 这里保持 BGR
+        (x, y, to_x, to_y), slots = self._get_char_bundle()
+        roi = self.frame[y:to_y, x:to_x, :3]
+        found = 0
+        for i, (name, mat, (wx, wy, wx2, wy2)) in enumerate(slots):
+            window = roi[wy - y:wy2 - y, wx - x:wx2 - x]
+            if window.shape[0] < mat.shape[0] or window.shape[1] < mat.shape[1]:
+                continue
+            if cv2.minMaxLoc(cv2.matchTemplate(window, mat, cv2.TM_CCOEFF_NORMED))[1] >= 0.8:
+                found |= 1 << i
+        state = TEAM_STATES[found]
+        if state[0]:
             self._logged_in = True
-            return True, current, exist_count + 1
-        else:
-            return False, -1, exist_count + 1
+        return state
 
         # Function to check if a component forms a ring
 
+    def _get_char_bundle(self):
+        """
+        char_1/2/3_text 的模板与搜索窗口，首次使用时收集，模板重新加载后重建。
+        搜索窗口与 find_one 相同：标注区域向四周各扩展 default_horizontal/vertical_variance，至少 1 像素。
+        Returns: (三个窗口的并集 (x, y, to_x, to_y), ((名称, 模板, 窗口 (x, y, to_x, to_y)), ...))
+        """
+        names = ('char_1_text', 'char_2_text', 'char_3_text')
+        mats = tuple(self.get_feature_by_name(name).mat for name in names)
+        if self._char_bundle is None or any(a is not b for a, b in zip(self._char_bundle[0], mats)):
+            pad_x = max(1, round(self.screen_width * _IN_TEAM_VARIANCE))
+            pad_y = max(1, round(self.screen_height * _IN_TEAM_VARIANCE))
+            windows = []
+            for name in names:
+                box = self.get_box_by_name(name)
+                windows.append((max(box.x - pad_x, 0), max(box.y - pad_y, 0),
+                                min(box.x + box.width + pad_x, self.screen_width),
+                                min(box.y + box.height + pad_y, self.screen_height)))
+            union = (min(w[0] for w in windows), min(w[1] for w in windows),
+                     max(w[2] for w in windows), max(w[3] for w in windows))
+            self._char_bundle = (mats, union, tuple(zip(names, (mat[:, :, :3] for mat in mats), windows)))
+        return self._char_bundle[1:]
+
     def handle_monthly_card(self):
         """处理月卡弹窗的点击逻辑"""
         monthly_card = self.find_one('monthly_card', threshold=0.8)
@@ -1037,8 +1561,8 @@ class BaseWWTask(BaseTask):
             # self.screenshot('monthly_card2')
             self.click_relative(0.50, 0.89)
             self.sleep(2)
-            self.wait_until(self.in_team_and_world, time_out=10,
-                            post_action=lambda: self.click_relative(0.50, 0.89, after_sleep=1))
+            self.wait_until_adaptive(self.in_team_and_world, time_out=10,
+                                     post_action=lambda: self.click_relative(0.50, 0.89, after_sleep=1))
             # self.screenshot('monthly_card3')
             self.set_check_monthly_card(next_day=True)
         logger.debug(f'check_monthly_card {monthly_card}')
@@ -1046,14 +1570,8 @@ class BaseWWTask(BaseTask):
 
     @property
     def game_lang(self):
-        """通过窗口标题判断游戏语言"""
-        if '鸣潮' in self.hwnd_title:
-            return 'zh_CN'
-        elif 'Wuthering' in self.hwnd_title:
-            return 'en_US'
-        elif '鳴潮' in self.hwnd_title:
-            return 'zh_TW'
-        return 'unknown_lang'
+        """通过窗口标题判断游戏语言，同一标题只判断一次"""
+        return _lang_from_title(self.hwnd_title)
 
     def open_esc_menu(self):
         """打开ESC菜单"""
@@ -1105,7 +1623,7 @@ class BaseWWTask(BaseTask):
         self.wait_until(self.click_traval_button, raise_if_not_found=True, time_out=10)
 
     def wait_book(self, feature="gray_book_all_monsters", time_out=3):
-        gray_book_boss = self.wait_until(
+        gray_book_boss = self.wait_until_adaptive(
             lambda: self.find_one(feature, vertical_variance=0.8, horizontal_variance=0.05,
                                   threshold=0.3),
             time_out=time_out, settle_time=1)
@@ -1141,8 +1659,12 @@ class BaseWWTask(BaseTask):
         else:
             min_width = self.width_of_screen(475 / 2560)
             min_height = self.height_of_screen(40 / 1440)
-            double = find_color_rectangles(self.frame, double_drop_color, min_width, min_height,
-                                           box=self.box_of_screen(1990 / 2560, 170 / 1440, 2500 / 2560, 245 / 1440))
+            double_box = self.screen_box(1990 / 2560, 170 / 1440, 2500 / 2560, 245 / 1440)
+            # 像素占比不足以组成 min_width x min_height 的色块时，跳过轮廓查找
+            double = None
+            if self.box_color_percentage(double_drop_lower, double_drop_upper, double_box) * \
+                    double_box.width * double_box.height >= min_width * min_height:
+                double = find_color_rectangles(self.frame, double_drop_color, min_width, min_height, box=double_box)
             if double:
                 logger.info(f'double drop!')
                 bar_top = double_bar_top
@@ -1151,7 +1673,7 @@ class BaseWWTask(BaseTask):
             y = gap_per_index * (serial_number - container_max_rows + default_container_display) + bar_top
             self.click_relative(0.98, y)
             logger.info(f'scroll to target')
-            btns = self.find_feature('boss_proceed', box=self.box_of_screen(0.94, 0.6, 0.97, 0.88), threshold=0.8)
+            btns = self.find_feature('boss_proceed', box=self.screen_box(0.94, 0.6, 0.97, 0.88), threshold=0.8)
             if btns is None:
                 raise Exception("can't find boss_proceed")
             bottom_btn = max(btns, key=lambda box: box.y)
@@ -1186,12 +1708,14 @@ double_drop_color = {
     'g': (120, 160),  # Green range
     'b': (70, 110)  # Blue range
 }
+double_drop_lower, double_drop_upper = color_range_to_bound(double_drop_color)
 
 echo_color = {
     'r': (200, 255),  # Red range
     'g': (150, 220),  # Green range
     'b': (130, 170)  # Blue range
 }
+echo_lower, echo_upper = color_range_to_bound(echo_color)
 
 
 def calculate_angle_clockwise(box1, box2):
@@ -1206,10 +1730,7 @@ def calculate_angle_clockwise(box1, box2):
     # math.atan2(dy, dx) gives angle from positive x-axis, positive CCW.
     # Negate for positive CW convention.
 
-    degree = math.degrees(math.atan2(dy, dx))
-    if degree < 0:
-        degree += 360
-    return degree
+    return math.degrees(math.atan2(dy, dx)) % 360
 
 
 lower_white = np.array([244, 244, 244], dtype=np.uint8)
@@ -1218,38 +1739,35 @@ upper_white = np.array([255, 255, 255], dtype=np.uint8)
 black = np.array([0, 0, 0], dtype=np.uint8)
 
 
-def isolate_white_text_to_black(cv_image):
+def isolate_white_text_to_black(cv_image, bgr=False):
     """
     Converts pixels in the near-white range (244-255) to black,
     and all others to white.
     Args:
         cv_image: Input image (NumPy array, BGR).
+        bgr: Expand the result to 3 channels, for consumers that require BGR input.
     Returns:
-        Black and white image (NumPy array), where matches are black.
+        Black and white image (NumPy array, single channel unless bgr), where matches are black.
     """
     match_mask = cv2.inRange(cv_image, black, lower_white_none_inclusive)
-    output_image = cv2.cvtColor(match_mask, cv2.COLOR_GRAY2BGR)
-
-    return output_image
+    return cv2.cvtColor(match_mask, cv2.COLOR_GRAY2BGR) if bgr else match_mask
 
 
-def convert_bw(cv_image):
+def convert_bw(cv_image, bgr=False):
     match_mask = cv2.inRange(cv_image, lower_white, upper_white)
-    output_image = cv2.cvtColor(match_mask, cv2.COLOR_GRAY2BGR)
-    return output_image
+    return cv2.cvtColor(match_mask, cv2.COLOR_GRAY2BGR) if bgr else match_mask
 
 
 lower_icon_white = np.array([210, 210, 210], dtype=np.uint8)
 upper_icon_white = np.array([240, 240, 240], dtype=np.uint8)
 
 
-def convert_dialog_icon(cv_image):
+def convert_dialog_icon(cv_image, bgr=False):
     match_mask = cv2.inRange(cv_image, lower_icon_white, upper_icon_white)
-    output_image = cv2.cvtColor(match_mask, cv2.COLOR_GRAY2BGR)
-    return output_image
+    return cv2.cvtColor(match_mask, cv2.COLOR_GRAY2BGR) if bgr else match_mask
 
 
-def binarize_for_matching(image):
+def binarize_for_matching(image, precomputed_gray=None):
     """
     Converts a colored image to a binary image based on a brightness threshold.
 
@@ -1257,11 +1775,18 @@ def binarize_for_matching(image):
     and all other pixels become pure black (0).
 
     Args:
-        image (np.array): The input BGR image from OpenCV.
+        image (np.array): The input BGR image from OpenCV, or an already grayscale image.
+        precomputed_gray (np.array): Optional grayscale version of image, skips the conversion.
 
     Returns:
         np.array: The resulting binary image (single channel, 8-bit).
     """
+    if precomputed_gray is not None or image.ndim == 2:
+        # The caller's gray image must not be modified, threshold into a new array.
+        gray_image = image if precomputed_gray is None else precomputed_gray
+        _, binary_image = cv2.threshold(gray_image, 244, 255, cv2.THRESH_BINARY)
+        return binary_image
+
     # Convert the image to grayscale for a single brightness value per pixel.
     # This is more robust than checking individual R, G, B channels.
 
@@ -1271,5 +1796,6 @@ def binarize_for_matching(image):
     # Pixels > 239 will be set to 255 (white).
     # Pixels <= 239 will be set to 0 (black).
     # cv2.THRESH_BINARY is the type of thresholding we want.
-    _, binary_image = cv2.threshold(gray_image, 244, 255, cv2.THRESH_BINARY)
+    # The gray image is a temporary, threshold it in place instead of allocating another one.
+    _, binary_image = cv2.threshold(gray_image, 244, 255, cv2.THRESH_BINARY, dst=gray_image)
     return binary_image
\ No newline at end of file
@@ -181,13 +181,20 @@ class FarmMapTask(BigMap):
         current_adjust = None
         self.center_camera()
         too_far_count = 0
+        last_middle_click = 0
 
+        self.start_angle_tracker()
         try:
             while True:
                 self.sleep(0.01)
-                self.middle_click(interval=1, after_sleep=0.2)
+                # 中键重置视角后朝向需要重新识别，后台线程此前的结果作废
+                if time.monotonic() - last_middle_click >= 1:
+                    self.middle_click(after_sleep=0.2)
+                    self.invalidate_my_angle()
+                    last_middle_click = time.monotonic()
                 self._has_health_bar = False
                 if self.in_combat():
+                    self.stop_angle_tracker()
                     self.sleep(2)
                     self._stop_movement(current_direction)
                     current_direction = None
@@ -202,6 +209,7 @@ class FarmMapTask(BigMap):
                         self.sleep(0.5)
                         if not dropped or not has_more:
                             break
+                    self.start_angle_tracker()
 
                 star, distance, angle = self.find_direction_angle()
                 if not star:
@@ -225,6 +233,7 @@ class FarmMapTask(BigMap):
                     logger.info(f'might be stuck, try {[self.stuck_index % 4]}')
                     self.send_key(self.stuck_keys[self.stuck_index % 4][0],
                                   down_time=self.stuck_keys[self.stuck_index % 4][1], after_sleep=0.5)
+                    self.invalidate_my_angle()
                     self.stuck_index += 1
                     continue
 
@@ -239,6 +248,7 @@ class FarmMapTask(BigMap):
                 # --- END REFACTORED BLOCK ---
 
         finally:
+            self.stop_angle_tracker()
             self._stop_movement(current_direction)
 
 
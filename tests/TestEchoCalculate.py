@@ -0,0 +1,84 @@
+import unittest
+from collections import defaultdict
+from itertools import combinations
+
+from src.echo.calculate import SCORE_STEP, calculator
+from src.echo.profile import EchoProfile, EntryCoef, ProfileTable
+from src.echo.stats import stats_manager
+
+
+def brute_force_prob(profile, coef, threshold):
+    needed = threshold - calculator.get_score(profile, coef)
+    if needed <= 0:
+        return 1.0
+    pool = [key for key in stats_manager.get_all_keys() if getattr(profile, key) == 0]
+    k = 5 - (len(stats_manager.get_all_keys()) - len(pool))
+    if k <= 0:
+        return 0.0
+    total, count = 0.0, 0
+    for combo in combinations(pool, k):
+        dist = {0.0: 1.0}
+        for key in combo:
+            new_dist = defaultdict(float)
+            weight = getattr(coef, key)
+            for s1, p1 in dist.items():
+                for item in stats_manager.get_distribution(key):
+                    new_dist[s1 + item['value'] * weight] += p1 * item['probability']
+            dist = new_dist
+        total += sum(p for s, p in dist.items() if s >= needed - 1e-9)
+        count += 1
+    return total / count
+
+
+class TestEchoCalculate(unittest.TestCase):
+
+    def test_prob_above_score(self):
+        coef = EntryCoef('Lupa')
+        profile = EchoProfile(level=10, cri_rate=6.3, cri_dmg=12.6)
+        for threshold in [20, 30, 35, 40, 60]:
+            expected = brute_force_prob(profile, coef, threshold)
+            self.assertAlmostEqual(expected, calculator.prob_above_score(profile, coef, threshold), delta=1e-3)
+
+    def test_prob_above_score_many_empty_slots(self):
+        # k >= 4 时走分支限界 + FFT 路径; 量化后每个槽位的得分误差不超过 SCORE_STEP / 2,
+        # 再加上阈值向上取整的 SCORE_STEP, 结果应落在精确值的对应区间内
+        coef = EntryCoef('Lupa')
+        for profile in [EchoProfile(level=5, cri_rate=6.3), EchoProfile()]:
+            current = calculator.get_score(profile, coef)
+            max_score = calculator.get_max_possible_score(profile, coef)
+            k = 5 - sum(1 for key in stats_manager.get_all_keys() if getattr(profile, key) != 0)
+            self.assertGreaterEqual(k, 4)
+            tolerance = (k + 2) * SCORE_STEP / 2
+            for threshold in [current + 5, 20, 30, 40, 50, max_score - 1, max_score + 1]:
+                actual = calculator.prob_above_score(profile, coef, threshold)
+                upper = brute_force_prob(profile, coef, threshold - tolerance)
+                lower = brute_force_prob(profile, coef, threshold + tolerance)
+                self.assertLessEqual(lower - 1e-6, actual, threshold)
+                self.assertLessEqual(actual, upper + 1e-6, threshold)
+
+    def test_prob_above_score_full(self):
+        coef = EntryCoef('Zani')
+        profile = EchoProfile(level=25, cri_rate=6.3, cri_dmg=12.6, atk_rate=7.9, atk_num=40, charged_atk=8.6)
+        score = calculator.get_score(profile, coef)
+        self.assertEqual(1.0, calculator.prob_above_score(profile, coef, score - 1))
+        self.assertEqual(0.0, calculator.prob_above_score(profile, coef, score + 1))
+
+    def test_profile_table(self):
+        coef = EntryCoef('Cartethyia')
+        profiles = [EchoProfile(level=10, name='梦魇·凯尔匹', cri_rate=6.3, def_num=50),
+                    EchoProfile(level=5, name='梦魇·凯尔匹', atk_num=41),
+                    EchoProfile()]
+        table = ProfileTable(capacity=1)
+        for profile in profiles:
+            table.append(profile)
+        self.assertEqual(len(profiles), len(table))
+        self.assertEqual([p.validate() for p in profiles], table.valid_mask().tolist())
+        for i, profile in enumerate(profiles):
+            self.assertEqual(profile, table.to_profile(i))
+            self.assertAlmostEqual(calculator.get_score(profile, coef), calculator.get_scores(table, coef)[i])
+            self.assertAlmostEqual(calculator.prob_above_score(profile, coef, 20),
+                                   calculator.prob_above_scores(table, coef, 20)[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
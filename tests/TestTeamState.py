@@ -0,0 +1,34 @@
+import unittest
+from itertools import product
+
+from src.task.BaseWWTask import TEAM_STATES, team_state
+
+
+def reference_in_team(arr):
+    current = -1
+    exist_count = 0
+    for i in range(len(arr)):
+        if arr[i] is None:
+            if current == -1:
+                current = i
+        else:
+            exist_count += 1
+    if exist_count == 2 or exist_count == 1:
+        return True, current, exist_count + 1
+    else:
+        return False, -1, exist_count + 1
+
+
+class TestTeamState(unittest.TestCase):
+
+    def test_all_combinations(self):
+        for found in product((False, True), repeat=3):
+            arr = [object() if f else None for f in found]
+            mask = sum(1 << i for i, f in enumerate(found) if f)
+            expected = reference_in_team(arr)
+            self.assertEqual(expected, team_state(found))
+            self.assertEqual(expected, TEAM_STATES[mask])
+
+
+if __name__ == '__main__':
+    unittest.main()
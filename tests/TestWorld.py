@@ -19,6 +19,17 @@ class TestWorld(TaskTestCase):
         self.logger.info(f'in_world = {in_world}')
         self.assertIsNotNone(in_world)
 
+    def test_bw_frame_matching(self):
+        # find_one 按 [:, :, :3] 切片搜索区域, 黑白帧必须保持三通道
+        for image in ['tests/images/all_cd_1080p.png', 'tests/images/in_combat.png', 'tests/images/treasure.png']:
+            self.task.do_reset_to_false()
+            self.set_image(image)
+            bw = self.task.bw_frame()
+            self.assertEqual(3, bw.ndim)
+            self.assertEqual(self.task.frame.shape[:2], bw.shape[:2])
+            self.task.in_world()
+            self.task.in_realm()
+
 
 if __name__ == '__main__':
     unittest.main()